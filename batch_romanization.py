@@ -0,0 +1,128 @@
+"""Romanize many name forms at once, grouped by language.
+
+Romanizing names one row at a time in input order makes transliteration
+models and language tag lookups thrash between languages. The function
+romanize_batch() instead groups the records by language tag, resolves the
+script of each tag once, romanizes each group in bulk (unidecode for tags in
+Latin script, polyglot transliteration for the rest; see
+romanization_cache.py), and scatters the results back into input order.
+Groups can be romanized in parallel worker processes.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+import logging
+from names import language_script
+from romanization_cache import banalize, get_cache, install_cache
+from romanization_cache import transliterate
+import string
+from transliteration import TRANSLITERATORS
+from urllib.error import URLError
+
+
+def romanize(text: str, language: str, script: str = None):
+    """Romanize one name form.
+
+    Args:
+        text: name form to romanize
+        language: language tag of text
+        script: ISO 15924 code of the script of language (default: resolved
+            with names.language_script)
+
+    Returns:
+        The unidecode form of text if script is Latin; otherwise the polyglot
+        transliteration of text, in title case.
+
+    Exceptions raised:
+        - urllib.error.URLError: the transliteration model for language is
+          not available.
+
+    """
+    if script is None:
+        script = language_script(language)
+    if script == 'Latn':
+        return banalize(text)
+    return string.capwords(transliterate(text, language))
+
+
+def romanize_group(language: str, texts: list, cache_path: str = None):
+    """Romanize name forms that share one language tag.
+
+    Args:
+        language: language tag of all of texts
+        texts: list of name forms
+        cache_path: filepath of the romanization cache to use (for worker
+            processes; default: the installed cache)
+
+    Returns:
+        A list with one (romanized form, None) or (None, exception) tuple
+        per text, in order.
+
+    """
+    if cache_path is not None and get_cache().path != cache_path:
+        install_cache(cache_path)
+    try:
+        script = language_script(language)
+        if script != 'Latn':
+            TRANSLITERATORS.get(language)  # load the model once, up front
+    except (AttributeError, URLError) as exc:
+        return [(None, exc) for text in texts]
+    results = []
+    for text in texts:
+        try:
+            results.append((romanize(text, language, script), None))
+        except URLError as exc:
+            results.append((None, exc))
+    return results
+
+
+def romanize_batch(records, workers: int = 0):
+    """Romanize many name forms, one language at a time.
+
+    Args:
+        records: sequence of (language tag, name form) tuples
+        workers: number of worker processes among which to divide the
+            language groups (0 or 1: romanize in this process)
+
+    Returns:
+        A list with one (romanized form, None) or (None, exception) tuple
+        per record, in input order. Records whose language tag names no
+        script get an AttributeError; those whose transliteration model is
+        not available get a URLError.
+
+    """
+    logger_name = ':'.join(
+        (__name__, inspect.currentframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    records = list(records)
+    groups = {}
+    for i, (language, text) in enumerate(records):
+        groups.setdefault(language, {}).setdefault(text, []).append(i)
+    results = [None] * len(records)
+    # biggest groups first, so the workers finish at about the same time
+    order = sorted(groups, key=lambda l: len(groups[l]), reverse=True)
+
+    def scatter(language, group_results):
+        for indexes, result in zip(groups[language].values(), group_results):
+            for i in indexes:
+                results[i] = result
+
+    if workers > 1 and len(groups) > 1:
+        cache_path = get_cache().path
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (language, executor.submit(
+                    romanize_group, language, list(groups[language]),
+                    cache_path))
+                for language in order]
+            for language, future in futures:
+                scatter(language, future.result())
+    else:
+        for language in order:
+            scatter(language, romanize_group(language, list(groups[language])))
+    logger.info(
+        'romanized {} records ({} distinct) in {} language groups'
+        ''.format(
+            len(results), sum(len(texts) for texts in groups.values()),
+            len(groups)))
+    return results
@@ -0,0 +1,119 @@
+"""
+Script to precompile the vocabulary lookup files read by vocabulary_store.py.
+"""
+
+from arglogger import arglogger
+import argparse
+import inspect
+import logging
+import os
+from os.path import abspath, basename, realpath
+import re
+import sys
+import traceback
+from vocabulary_store import compile_store, DEFAULT_VOCABULARY_PATH
+from vocabulary_store import parse_vocabulary_text
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+POSITIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', logging.getLevelName(DEFAULT_LOG_LEVEL),
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR'],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)'],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)'],
+    ['-d', '--destination', DEFAULT_VOCABULARY_PATH,
+        'directory to which to write the lookup files'],
+]
+
+
+@arglogger
+def main(args):
+    """
+    main function
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    dest = abspath(realpath(args.destination))
+    if len(args.sources) == 0:
+        vocabularies = None
+    else:
+        vocabularies = {}
+        for source in args.sources:
+            with open(abspath(realpath(source)), 'r', encoding='utf-8') as f:
+                vocabularies.update(parse_vocabulary_text(f.read()))
+    vocab_names = compile_store(dest, vocabularies)
+    logger.info(
+        'wrote {} vocabularies to {}: {}'
+        ''.format(len(vocab_names), dest, ', '.join(vocab_names)))
+
+
+if __name__ == "__main__":
+    log_level = DEFAULT_LOG_LEVEL
+    log_level_name = logging.getLevelName(log_level)
+    logging.basicConfig(level=log_level)
+    try:
+        parser = argparse.ArgumentParser(
+            description=__doc__,
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        for p in POSITIONAL_ARGUMENTS:
+            d = {
+                'help': p[3]
+            }
+            if type(p[2]) == bool:
+                if p[2] is False:
+                    d['action'] = 'store_true'
+                    d['default'] = False
+                else:
+                    d['action'] = 'store_false'
+                    d['default'] = True
+            else:
+                d['default'] = p[2]
+            parser.add_argument(
+                p[0],
+                p[1],
+                **d)
+        parser.add_argument(
+            'sources',
+            type=str,
+            nargs='*',
+            help='text files saved by vocab_getter.py (default: compile '
+                 'vocabularies.py)')
+        args = parser.parse_args()
+        if args.loglevel is not None:
+            args_log_level = re.sub('\s+', '', args.loglevel.strip().upper())
+            try:
+                log_level = getattr(logging, args_log_level)
+            except AttributeError:
+                logging.error(
+                    "command line option to set log_level failed "
+                    "because '%s' is not a valid level name; using %s"
+                    % (args_log_level, log_level_name))
+        if args.veryverbose:
+            log_level = logging.DEBUG
+        elif args.verbose:
+            log_level = logging.INFO
+        log_level_name = logging.getLevelName(log_level)
+        logging.getLogger().setLevel(log_level)
+        fn_this = inspect.stack()[0][1].strip()
+        title_this = __doc__.strip()
+        logging.info(': '.join((fn_this, title_this)))
+        if log_level != DEFAULT_LOG_LEVEL:
+            logging.warning(
+                "logging level changed to %s via command line option"
+                % log_level_name)
+        else:
+            logging.info("using default logging level: %s" % log_level_name)
+        logging.debug("command line: '%s'" % ' '.join(sys.argv))
+        main(args)
+        sys.exit(0)
+    except KeyboardInterrupt as e:  # Ctrl-C
+        raise e
+    except SystemExit as e:  # sys.exit()
+        raise e
+    except Exception as e:
+        print("ERROR, UNEXPECTED EXCEPTION")
+        print(str(e))
+        traceback.print_exc()
+        os._exit(1)
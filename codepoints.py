@@ -0,0 +1,182 @@
+"""Precomputed codepoint classification for name forms.
+
+Defines the class CodepointTable, built once from UNICODE_RANGES, which
+answers in a single (C-level) pass over a string which of those ranges it
+uses, whether it stays within the ranges allowed in romanized forms, and
+which scripts its letters are written in. Whole columns of strings can be
+classified at once. TABLE is the table shared by names.py (romanized form
+validation), prefetch.py, and language_detection.py (the language/script
+consistency pre-check).
+
+"""
+import unicodedata
+
+# named ranges of codepoints that name forms may use
+UNICODE_RANGES = {
+    'basic_latin': (r'\u0020', r'\u007F'),
+    'latin_1': (r'\u00A0', r'\u00FF'),
+    'latin_extended_a': (r'\u0100', r'\u017F'),
+    'latin_extended_b': (r'\u0180', r'\u024F'),
+    'latin_extended_additional': (r'\u1E00', r'\u1EFF'),
+    'ipa_extensions': (r'\u0250', r'\u02AF'),
+    'spacing_modifier_letters': (r'\u02B0', r'\u02FF'),
+    'latin_extended_c': (r'\u2C60', r'\u2C7F'),
+    'combining_diacritical_marks': (r'\u0300', r'\u036F')
+}
+# ranges of UNICODE_RANGES that romanized name forms may use
+ROMANIZED_RANGES = [
+    'basic_latin',
+    'latin_1',
+    'latin_extended_a',
+    'latin_extended_b',
+    'latin_extended_additional',
+    'ipa_extensions',
+    'spacing_modifier_letters',
+    'latin_extended_c',
+    'combining_diacritical_marks']
+# ISO 15924 script codes (as used in IANA language subtags) and the first
+# word of the Unicode character names of letters in that script
+SCRIPT_NAMES = {
+    'Arab': 'ARABIC',
+    'Armn': 'ARMENIAN',
+    'Copt': 'COPTIC',
+    'Cyrl': 'CYRILLIC',
+    'Deva': 'DEVANAGARI',
+    'Ethi': 'ETHIOPIC',
+    'Geor': 'GEORGIAN',
+    'Grek': 'GREEK',
+    'Hebr': 'HEBREW',
+    'Latn': 'LATIN',
+    'Syrc': 'SYRIAC',
+}
+# classified characters are translated to marker characters in plane 16
+# (supplementary private use area B), which name data does not use
+MARKER_BASE = 0x100000
+MAX_SCRIPT_CODEPOINT = 0xFFFF  # tabulate the BMP; classify the rest lazily
+
+
+def codepoint_range(bounds):
+    """Get (first, last) codepoints from a pair of r'\\uXXXX' strings."""
+    return tuple(int(b[2:], 16) for b in bounds)
+
+
+class CodepointTable:
+    """Classify the characters of strings by Unicode range and script."""
+
+    def __init__(
+        self,
+        ranges: dict = UNICODE_RANGES,
+        romanized_ranges: list = ROMANIZED_RANGES,
+        scripts: dict = SCRIPT_NAMES
+    ):
+        """Build the range tables (the script table is built on first use).
+
+        Args:
+            ranges: dictionary of (first, last) r'\\uXXXX' codepoint pairs
+                keyed by range name
+            romanized_ranges: names of the ranges allowed in romanized forms
+            scripts: dictionary of Unicode character name prefixes keyed by
+                ISO 15924 script code
+
+        """
+        self.range_names = list(ranges.keys())
+        self.scripts = dict(scripts)
+        self._range_markers = {}
+        self._romanized = {}
+        for i, name in enumerate(self.range_names):
+            first, last = codepoint_range(ranges[name])
+            marker = chr(MARKER_BASE + i)
+            for cp in range(first, last + 1):
+                self._range_markers.setdefault(cp, marker)
+                if name in romanized_ranges:
+                    self._romanized[cp] = None
+        self._script_codes = list(self.scripts.keys())
+        self._script_markers = None
+
+    def _build_script_markers(self):
+        prefixes = {
+            prefix: chr(MARKER_BASE + i)
+            for i, prefix in enumerate(self.scripts.values())}
+        markers = {}
+        for cp in range(MAX_SCRIPT_CODEPOINT + 1):
+            c = chr(cp)
+            if not unicodedata.category(c).startswith('L'):
+                markers[cp] = None  # not a letter: ignore
+                continue
+            try:
+                prefix = unicodedata.name(c).split()[0]
+            except ValueError:
+                continue
+            try:
+                markers[cp] = prefixes[prefix]
+            except KeyError:
+                pass
+        self._script_markers = markers
+
+    def ranges_used(self, text: str):
+        """Get the names of the ranges whose characters text uses.
+
+        Returns:
+            A frozenset of range names, including None if text uses any
+            character outside all of the ranges.
+
+        """
+        used = set()
+        for c in set(text.translate(self._range_markers)):
+            i = ord(c) - MARKER_BASE
+            if 0 <= i < len(self.range_names):
+                used.add(self.range_names[i])
+            else:
+                used.add(None)
+        return frozenset(used)
+
+    def is_romanized(self, text: str):
+        """Does text use only characters allowed in romanized forms?"""
+        return text.translate(self._romanized) == ''
+
+    def scripts_used(self, text: str):
+        """Get the scripts in which the letters of text are written.
+
+        Returns:
+            A frozenset of ISO 15924 script codes, including None if any
+            letter is in a script not listed in scripts. Characters that
+            are not letters (spaces, punctuation, combining marks) are
+            ignored.
+
+        """
+        if self._script_markers is None:
+            self._build_script_markers()
+        used = set()
+        for c in set(text.translate(self._script_markers)):
+            i = ord(c) - MARKER_BASE
+            if 0 <= i < len(self._script_codes):
+                used.add(self._script_codes[i])
+            elif unicodedata.category(c).startswith('L'):
+                # a letter beyond the table: classify it the slow way
+                used.add(self._script_of_letter(c))
+        return frozenset(used)
+
+    def _script_of_letter(self, c: str):
+        try:
+            prefix = unicodedata.name(c).split()[0]
+        except ValueError:
+            return None
+        for code, name in self.scripts.items():
+            if name == prefix:
+                return code
+        return None
+
+    def classify_column(self, texts):
+        """Get ranges_used() for each of a sequence of strings."""
+        return [self.ranges_used(text) for text in texts]
+
+    def romanized_column(self, texts):
+        """Get is_romanized() for each of a sequence of strings."""
+        return [text.translate(self._romanized) == '' for text in texts]
+
+    def scripts_column(self, texts):
+        """Get scripts_used() for each of a sequence of strings."""
+        return [self.scripts_used(text) for text in texts]
+
+
+TABLE = CodepointTable()
@@ -0,0 +1,226 @@
+"""Random access to the rows of a CSV file by key.
+
+Defines the class CSVIndex, which records the byte offset of every record of
+a CSV file, and the records in which each value of a key column (e.g.,
+"nameid") occurs, in a sidecar file next to it ("<file>.<key>.idx"). The CSV
+file is memory-mapped, so fetching the rows for a few keys (e.g., to re-run
+massage-names.py on just the names that failed) reads only those records,
+however large the file is. The sidecar records the size and modification
+time of the file it indexes and is rebuilt when they change.
+
+Records are found as parallel_csv.py finds chunks (see record_boundaries),
+so the same restrictions on encodings and dialects apply, and files with
+ragged rows (or stray quote characters) cannot be indexed.
+
+"""
+import codecs
+import csv
+from csv_utilities import clean_row, detect_csv
+import inspect
+import io
+import json
+import logging
+import mmap
+import os
+from parallel_csv import check_splittable, dialect_params
+from parallel_csv import record_boundaries
+
+INDEX_VERSION = 1
+
+
+class CSVIndex:
+    """Look up the rows of a CSV file by the value of a key column."""
+
+    def __init__(
+        self, fname: str, key: str, dialect: str, encoding: str,
+        field_names: list, offsets: list, keys: dict
+    ):
+        """Open an index (use build, load, or open to make one).
+
+        Args:
+            fname: filepath of the CSV file
+            key: name of the key column
+            dialect: name of the dialect of the file
+            encoding: character encoding of the file
+            field_names: field names from the header row
+            offsets: byte offsets of the records, followed by the file size
+            keys: dictionary of lists of record numbers keyed by key value
+
+        """
+        self.fname = fname
+        self.key = key
+        self.dialect = dialect
+        self.encoding = encoding
+        self.field_names = field_names
+        self.offsets = offsets
+        self.keys = keys
+        self._params = dialect_params(dialect)
+        self._file = open(fname, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._data)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __contains__(self, key_value: str):
+        return key_value in self.keys
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def sidecar_path(fname: str, key: str):
+        """Get the filepath of the sidecar index of a file and key."""
+        return '{}.{}.idx'.format(fname, key)
+
+    @classmethod
+    def build(
+        cls, fname: str, key: str, dialect: str = None,
+        encoding: str = 'utf-8', save: bool = True
+    ):
+        """Index a CSV file by a key column.
+
+        Args:
+            fname: filepath of the CSV file
+            key: name of the key column
+            dialect: name of the dialect of the file (default: detect)
+            encoding: character encoding of the file
+            save: if True, write the sidecar file
+
+        Exceptions raised:
+            - ValueError: key is not a column of the file, or the file cannot
+              be split into records (see parallel_csv.check_splittable), or a
+              record does not have as many fields as the header row.
+
+        """
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        dialect, encoding = detect_csv(fname, dialect, encoding)
+        params = dialect_params(dialect)
+        check_splittable(params, encoding)
+        if params['quoting'] == csv.QUOTE_NONE:
+            quotechar = None
+        else:
+            quotechar = params['quotechar'].encode('ascii')
+        with open(fname, 'rb') as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # one record per "chunk"
+            offsets = record_boundaries(data, quotechar, 1)
+            field_names = next(csv.reader(
+                io.StringIO(codecs.decode(data[:offsets[1]], encoding)),
+                **params))
+            if codecs.lookup(encoding).name == 'utf-8-sig':
+                encoding = 'utf-8'  # records after the header have no BOM
+            try:
+                column = field_names.index(key)
+            except ValueError:
+                raise ValueError(
+                    'Key column "{}" is not among the fields of {} ({}).'
+                    ''.format(key, fname, ', '.join(field_names)))
+            offsets = offsets[1:]  # the header is not a row
+            keys = {}
+            for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+                text = io.StringIO(data[start:end].decode(encoding))
+                records = [v for v in csv.reader(text, **params) if v]
+                if len(records) == 0:
+                    continue  # blank lines at the end of the file
+                if (len(records) != 1
+                        or len(records[0]) != len(field_names)):
+                    raise ValueError(
+                        'CSV file {} cannot be indexed: bytes {}-{} do not '
+                        'hold exactly one record of {} fields (a stray quote '
+                        'character?).'
+                        ''.format(fname, start, end, len(field_names)))
+                value = records[0][column].strip()
+                keys.setdefault(value, []).append(i)
+        index = cls(
+            fname, key, dialect, encoding, field_names, offsets, keys)
+        logger.info(
+            'indexed {} rows with {} distinct values of "{}" in {}'
+            ''.format(len(index), len(keys), key, fname))
+        if save:
+            index.save()
+        return index
+
+    @classmethod
+    def load(cls, fname: str, key: str):
+        """Open the sidecar index of a file, or return None if it is stale.
+        """
+        path = cls.sidecar_path(fname, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return None
+        st = os.stat(fname)
+        if (d.get('version') != INDEX_VERSION or d['size'] != st.st_size
+                or d['mtime_ns'] != st.st_mtime_ns):
+            return None
+        return cls(
+            fname, key, d['dialect'], d['encoding'], d['field_names'],
+            d['offsets'], d['keys'])
+
+    @classmethod
+    def open(cls, fname: str, key: str, dialect: str = None,
+             encoding: str = 'utf-8'):
+        """Load the sidecar index of a file, building it if necessary."""
+        index = cls.load(fname, key)
+        if index is None:
+            index = cls.build(fname, key, dialect, encoding)
+        return index
+
+    def save(self):
+        """Write the sidecar file."""
+        st = os.stat(self.fname)
+        path = self.sidecar_path(self.fname, self.key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'dialect': self.dialect,
+                'encoding': self.encoding,
+                'field_names': self.field_names,
+                'offsets': self.offsets,
+                'keys': self.keys,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def record(self, i: int):
+        """Get the bytes of record i as a zero-copy view of the file.
+
+        The view must be released before the index is closed.
+
+        """
+        return self._view[self.offsets[i]:self.offsets[i + 1]]
+
+    def row(self, i: int):
+        """Get record i as a row dictionary, cleaned as read_csv does."""
+        with self.record(i) as record:
+            text = io.StringIO(str(record, self.encoding), newline=None)
+        reader = csv.DictReader(
+            text, fieldnames=self.field_names, **self._params)
+        for row in reader:
+            return clean_row(row)
+        return {}
+
+    def rows(self, key_values):
+        """Get the rows with any of the given key values, in file order.
+
+        Key values not in the file are ignored.
+
+        """
+        records = sorted({
+            i for v in key_values for i in self.keys.get(v, [])})
+        return [self.row(i) for i in records]
+
+    def close(self):
+        """Unmap and close the file."""
+        self._view.release()
+        self._data.close()
+        self._file.close()
@@ -5,7 +5,7 @@ A script for splitting CSV field values containing comma-delimited lists.
 from arglogger import arglogger
 import argparse
 from copy import deepcopy
-from csv_utilities import test_csv, read_csv, write_csv
+from csv_utilities import open_csv, write_csv
 import inspect
 import logging
 from normalize_space import normalize_space
@@ -40,58 +40,70 @@ def main(args):
     src = abspath(realpath(args.source))
     dest = abspath(realpath(args.destination))
     logger.debug('src: "{}"'.format(src))
-    dialect = test_csv(src, encoding=args.encoding)
+    dialect, field_names, src_data = open_csv(src, encoding=args.encoding)
     logger.debug('dialect: "{}"'.format(repr(dialect)))
-    src_data, field_names = read_csv(src, dialect, args.encoding)
     logger.debug('field_names: {}'.format(repr(field_names)))
-    logger.debug('rows: {}'.format(len(src_data)))
     if args.key not in field_names:
         raise ValueError(
             'specified key field ({}) not in CSV fieldnames ({})'
             ''.format(args.key, repr(field_names)))
-    dest_data = []
-    field_names = []
+    dest_data = split_rows(src_data, args.key, args.field)
+    if args.streamline:
+        dest_data = (item for item in dest_data if len(item.keys()) > 1)
+    write_csv(dest, field_names=field_names, data=dest_data)
+
+
+def split_rows(src_data, key: str, field: str):
+    """Split the comma-delimited values of field into rows of their own.
+
+    Args:
+        src_data: iterable of row dictionaries
+        key: name of the field to copy into each derivative row
+        field: name of the field to split
+
+    Returns:
+        A generator of row dictionaries: each row with field replaced by its
+        first value, followed by a row with key and field for each of the
+        other values.
+
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
     for i, item in enumerate(src_data):
-        field_names.extend(item.keys())
-        field_names = list(set(field_names))
         logger.debug('ITEM {}'.format(i))
         try:
-            field_value = item[args.field]
+            field_value = item[field]
         except KeyError:
             logger.debug(
                 'specified field ({}) is empty in this row; appending: {}.'
-                ''.format(args.field, repr(item)))
-            dest_data.append(item)
+                ''.format(field, repr(item)))
+            yield item
         else:
             if ',' in field_value:
                 logger.info(
                     'specified field ({}) contains delimiter: splitting "{}".'
-                    ''.format(args.field, field_value))
-                d = {}
-                d[args.key] = item[args.key]
+                    ''.format(field, field_value))
                 splits = [normalize_space(v) for v in field_value.split(',')]
                 d = deepcopy(item)
-                d[args.field] = splits[0]
-                dest_data.append(d)
+                d[field] = splits[0]
                 logger.debug(
                     'appending primary derivative: {}'
                     ''.format(repr(d)))
+                yield d
                 for j, split in enumerate(splits[1:]):
                     d = {}
-                    d[args.key] = item[args.key]
-                    d[args.field] = split
-                    dest_data.append(d)
+                    d[key] = item[key]
+                    d[field] = split
                     logger.debug(
                         'appending derivative {}: {}'
                         ''.format(j+1, repr(d)))
+                    yield d
             else:
                 logger.debug(
                     'specified field ({}) does not contain delimiter'
                     ''.format(repr(item)))
-                dest_data.append(item)
-    if args.streamline:
-        dest_data = [item for item in dest_data if len(item.keys()) > 1]
-    write_csv(dest, field_names=field_names, data=dest_data)
+                yield item
 
 
 if __name__ == "__main__":
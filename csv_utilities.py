@@ -1,11 +1,16 @@
 """Reusable code for working with CSV files."""
 
+import codecs
 import csv
+import hashlib
+import io
+import json
 import logging
-from normalize_space import normalize_space
+import os
 from os.path import basename
 from pprint import pformat
 import sys
+import threading
 
 CSV_DIALECTS = {}
 csv.register_dialect(
@@ -34,30 +39,77 @@ csv.register_dialect(
     quoting=csv.QUOTE_ALL)
 for dialect_name in csv.list_dialects():
     CSV_DIALECTS[dialect_name] = csv.get_dialect(dialect_name)
+# attributes compared by dialects_match()
+DIALECT_ATTRIBUTES = (
+    'delimiter',
+    'doublequote',
+    'escapechar',
+    'lineterminator',
+    'quotechar',
+    'quoting',
+    'skipinitialspace',
+)
+FALLBACK_DIALECT = 'excel'  # used when the sniffed dialect is not registered
+SNIFF_SIZE = 1024  # characters given to the sniffer
+SNIFF_BYTES = 4 * SNIFF_SIZE  # bytes read to get them, in any encoding
+DEFAULT_DIALECT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'pleiades-batching',
+    'csv-dialects.json')
 
 
 def read_csv(fname: str, dialect, encoding='utf-8'):
     logger_name = ':'.join(
         (basename(__file__), __name__, sys._getframe().f_code.co_name))
     logger = logging.getLogger(logger_name)
-    raw = []
-    with open(fname, 'r', encoding=encoding) as f:
-        reader = csv.DictReader(f, dialect=dialect)
-        for row in reader:
-            raw.append(row)
-    field_names = reader.fieldnames
+    field_names, rows = iter_csv(fname, dialect, encoding)
+    cooked = list(rows)
     logger.info(
         'read {} rows of data from CSV file {}'
-        ''.format(len(raw), fname))
-    cooked = []
-    for item in raw:
-        logger.debug(pformat(item))
-        d = {k: v for k, v in item.items() if v is not None}
-        d = {k: v for k, v in d.items() if normalize_space(v) != ''}
-        cooked.append(d)
+        ''.format(len(cooked), fname))
     return (cooked, field_names)
 
 
+def iter_csv(fname: str, dialect, encoding='utf-8'):
+    """Read a CSV file one row at a time.
+
+    Rows are cleaned as read_csv cleans them: cells that are blank or hold
+    only whitespace are left out of the row dictionary.
+
+    Returns:
+        A tuple (field_names, rows): the list of field names from the header
+        row, and a generator of row dictionaries that reads the file as it
+        is consumed (and closes it when exhausted).
+
+    """
+    f = open(fname, 'r', encoding=encoding)
+    try:
+        reader = csv.DictReader(f, dialect=dialect)
+        field_names = reader.fieldnames
+    except Exception:
+        f.close()
+        raise
+    return (field_names, _iter_rows(f, reader))
+
+
+def _iter_rows(f, reader):
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    with f:
+        for row in reader:
+            if debug:
+                logger.debug(pformat(row))
+            yield clean_row(row)
+
+
+def clean_row(row: dict):
+    """Drop the cells of a row that are blank or hold only whitespace."""
+    # v.strip() is blank exactly when normalize_space(v) is
+    return {
+        k: v for k, v in row.items() if v is not None and v.strip() != ''}
+
+
 def write_csv(
     fname: str,
     field_names: list,
@@ -72,62 +124,217 @@ def write_csv(
             writer.writerow(d)
 
 
+def dialect_key(d):
+    """Get the tuple of the DIALECT_ATTRIBUTES of a dialect (or its name)."""
+    if type(d) == str:
+        d = CSV_DIALECTS[d]
+    return tuple(getattr(d, a, None) for a in DIALECT_ATTRIBUTES)
+
+
+# registered dialect names keyed by attribute tuple (first registered wins)
+DIALECT_NAMES = {}
+for dialect_name, dialect in CSV_DIALECTS.items():
+    DIALECT_NAMES.setdefault(dialect_key(dialect), dialect_name)
+
+
 def dialects_match(d1, d2):
-    if type(d1) == str:
-        dialect1 = CSV_DIALECTS[d1]
-    else:
-        dialect1 = d1
-    if type(d2) == str:
-        dialect2 = CSV_DIALECTS[d2]
-    else:
-        dialect2 = d2
-    attributes = {}
-    for a in dir(dialect1):
-        if a[0] != '_':
-            attributes[a] = getattr(dialect2, a)
-    attributes = {
-        k: v for k, v in attributes.items() if not callable(v)}
-    for k, v in attributes.items():
-        if v != getattr(dialect2, k):
-            return False
-    return True
+    return dialect_key(d1) == dialect_key(d2)
 
 
-def test_csv(fname: str, dialect_arg=None, encoding='utf-8'):
-    """Test if a file object points to valid CSV file."""
-    logger_name = ':'.join(
-        (basename(__file__), __name__, sys._getframe().f_code.co_name))
-    logger = logging.getLogger(logger_name)
-    with open(fname, 'r', encoding=encoding) as f:
-        smpl = f.read(1024)
+def sniffed_name(sniffed):
+    """Get the name of the registered dialect matching a sniffed one.
+
+    The sniffer reports doublequote=False whenever its sample has no doubled
+    quotes, which says nothing about the rest of the file, so sniffed
+    dialects are matched as if they doubled quotes (as the csv module does
+    by default).
+
+    Returns:
+        A dialect name, or None if no registered dialect matches.
+
+    """
+    key = dict(zip(DIALECT_ATTRIBUTES, dialect_key(sniffed)))
+    key['doublequote'] = True
+    return DIALECT_NAMES.get(tuple(key[a] for a in DIALECT_ATTRIBUTES))
+
+
+def sniff_dialect(sample: str, fname: str):
+    """Sniff the dialect of a sample of a CSV file."""
     try:
-        dialect = csv.Sniffer().sniff(smpl)
+        return csv.Sniffer().sniff(sample)
     except csv.Error as exc:
         raise csv.Error(
             'Dialect detection error on file {}.'
             ''.format(fname)) from exc
-    else:
-        if dialect_arg is not None:
-            if not dialects_match(dialect_arg, dialect):
-                logger.warning(
-                    'Dialect argument ({}) and sniffer result ({}) do not '
-                    'match. Using dialect argument to read {}.'
-                    ''.format(dialect_arg, pformat(dialect), fname))
-            else:
-                logger.debug('Dialect arg and sniff match!')
-            return dialect_arg
+
+
+def choose_dialect(fname: str, name, sniffed, dialect_arg=None):
+    """Choose the dialect in which to read a CSV file.
+
+    Args:
+        fname: filepath of the CSV file (for messages)
+        name: name of the registered dialect the sniffer found, or None
+        sniffed: the dialect the sniffer found (for messages)
+        dialect_arg: dialect requested by the caller, if any
+
+    Returns:
+        dialect_arg, if given; otherwise name, or FALLBACK_DIALECT (with a
+        warning) if the sniffed dialect is not registered.
+
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    if dialect_arg is not None:
+        if name is None or not dialects_match(dialect_arg, name):
+            logger.warning(
+                'Dialect argument ({}) and sniffer result ({}) do not '
+                'match. Using dialect argument to read {}.'
+                ''.format(dialect_arg, pformat(sniffed), fname))
         else:
-            for k, v in CSV_DIALECTS.items():
-                logger.debug('trying dialect: {}'.format(k))
-                if dialects_match(dialect, v):
-                    logger.info(
-                        'CSV file {} has dialect "{}".'.format(fname, k))
-                    return k
-            raise IOError(
-                'CSV file "{}" does not conform to any of the standard '
-                'syntax dialects ({}). Test results: {}'
-                ''.format(
-                    fname,
-                    ', '.join(CSV_DIALECTS.keys()),
-                    pformat(dialect)))
+            logger.debug('Dialect arg and sniff match!')
+        return dialect_arg
+    if name is None:
+        logger.warning(
+            'CSV file "{}" does not conform to any of the standard '
+            'syntax dialects ({}). Test results: {}. Using dialect "{}".'
+            ''.format(
+                fname,
+                ', '.join(CSV_DIALECTS.keys()),
+                pformat(dialect_key(sniffed)),
+                FALLBACK_DIALECT))
+        return FALLBACK_DIALECT
+    logger.info(
+        'CSV file {} has dialect "{}".'.format(fname, name))
+    return name
+
+
+class DialectCache:
+    """Remember the dialects and encodings detected for CSV files.
+
+    Entries are keyed by a fingerprint of the bytes the sniffer reads, so
+    re-reading a file (or any file with the same beginning) skips sniffing.
+
+    """
+
+    def __init__(self, path: str = DEFAULT_DIALECT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, fingerprint: str):
+        """Get a cached (dialect name, encoding) tuple, or None."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            try:
+                entry = tuple(self._entries[fingerprint])
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, fingerprint: str, dialect: str, encoding: str):
+        """Cache the dialect name and encoding of a file."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self._entries[fingerprint] = [dialect, encoding]
+            dirname = os.path.dirname(self.path)
+            if dirname != '':
+                os.makedirs(dirname, exist_ok=True)
+            tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+
+    def stats(self):
+        """Get a dictionary of cache counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+DIALECT_CACHE = DialectCache()
 
+
+def detect_csv(fname: str, dialect_arg=None, encoding='utf-8', cache=None):
+    """Detect the dialect and encoding of a CSV file (see open_csv).
+
+    Returns:
+        A tuple (dialect, encoding).
+
+    """
+    with open(fname, 'rb') as f:
+        return _detect(f, fname, dialect_arg, encoding, cache)
+
+
+def _detect(f, fname, dialect_arg, encoding, cache):
+    if cache is None:
+        cache = DIALECT_CACHE
+    head = f.read(SNIFF_BYTES)
+    if (codecs.lookup(encoding).name == 'utf-8'
+            and head.startswith(codecs.BOM_UTF8)):
+        encoding = 'utf-8-sig'
+    fingerprint = hashlib.sha256(
+        encoding.encode('ascii') + b'\0' + head).hexdigest()
+    cached = cache.get(fingerprint)
+    if cached is None:
+        sample = codecs.getincrementaldecoder(encoding)().decode(head)
+        sniffed = sniff_dialect(sample[:SNIFF_SIZE], fname)
+        name = sniffed_name(sniffed)
+        if name is not None:
+            cache.put(fingerprint, name, encoding)
+    else:
+        name, encoding = cached
+        sniffed = name
+    return (choose_dialect(fname, name, sniffed, dialect_arg), encoding)
+
+
+def open_csv(fname: str, dialect_arg=None, encoding='utf-8', cache=None):
+    """Detect the dialect of a CSV file and read it, from one open.
+
+    A UTF-8 byte order mark switches encoding 'utf-8' to 'utf-8-sig'. The
+    detected dialect and encoding are cached (see DialectCache).
+
+    Args:
+        fname: filepath of the CSV file
+        dialect_arg: dialect to use whatever the sniffer finds (a warning
+            is logged if they differ)
+        encoding: character encoding of the file
+        cache: DialectCache to use (default: DIALECT_CACHE)
+
+    Returns:
+        A tuple (dialect, field_names, rows), as for test_csv and iter_csv.
+
+    """
+    f = open(fname, 'rb')
+    try:
+        dialect, encoding = _detect(f, fname, dialect_arg, encoding, cache)
+        f.seek(0)
+        text = io.TextIOWrapper(f, encoding=encoding)
+        reader = csv.DictReader(text, dialect=dialect)
+        field_names = reader.fieldnames
+    except Exception:
+        f.close()
+        raise
+    return (dialect, field_names, _iter_rows(text, reader))
+
+
+def test_csv(fname: str, dialect_arg=None, encoding='utf-8'):
+    """Test if a file object points to valid CSV file."""
+    with open(fname, 'r', encoding=encoding) as f:
+        smpl = f.read(SNIFF_SIZE)
+    dialect = sniff_dialect(smpl, fname)
+    return choose_dialect(fname, sniffed_name(dialect), dialect, dialect_arg)
@@ -0,0 +1,127 @@
+"""
+Script to serve a Pleiades places JSON dump from a local stand-in web site.
+"""
+
+from arglogger import arglogger
+import argparse
+from fake_pleiades import FakePleiades
+import inspect
+import logging
+import os
+from os.path import abspath, basename, realpath
+import re
+import sys
+import time
+import traceback
+
+DEFAULT_LOG_LEVEL = logging.WARNING
+POSITIONAL_ARGUMENTS = [
+    ['-l', '--loglevel', logging.getLevelName(DEFAULT_LOG_LEVEL),
+        'desired logging level (' +
+        'case-insensitive string: DEBUG, INFO, WARNING, or ERROR'],
+    ['-v', '--verbose', False, 'verbose output (logging level == INFO)'],
+    ['-w', '--veryverbose', False,
+        'very verbose output (logging level == DEBUG)'],
+    ['-p', '--port', 8080, 'port on which to listen'],
+    ['-L', '--latency', 0.0, 'seconds to wait before each response'],
+    ['-j', '--jitter', 0.0, 'maximum random seconds added to latency'],
+    ['-e', '--error-rate', 0.0, 'fraction of requests answered with 503'],
+    ['-d', '--drop-rate', 0.0,
+        'fraction of requests dropped without any response'],
+]
+
+
+@arglogger
+def main(args):
+    """
+    main function
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    src = abspath(realpath(args.source))
+    logger.debug('src: "{}"'.format(src))
+    fake = FakePleiades.from_dump(
+        src,
+        latency=float(args.latency),
+        jitter=float(args.jitter),
+        error_rate=float(args.error_rate),
+        drop_rate=float(args.drop_rate),
+        port=int(args.port))
+    with fake:
+        print('serving {} at {} (Ctrl-C to stop)'.format(
+            basename(src), fake.base_url))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    logger.info('requests: {}'.format(fake.stats()))
+
+
+if __name__ == "__main__":
+    log_level = DEFAULT_LOG_LEVEL
+    log_level_name = logging.getLevelName(log_level)
+    logging.basicConfig(level=log_level)
+    try:
+        parser = argparse.ArgumentParser(
+            description=__doc__,
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        for p in POSITIONAL_ARGUMENTS:
+            d = {
+                'help': p[3]
+            }
+            if type(p[2]) == bool:
+                if p[2] is False:
+                    d['action'] = 'store_true'
+                    d['default'] = False
+                else:
+                    d['action'] = 'store_false'
+                    d['default'] = True
+            else:
+                d['default'] = p[2]
+            parser.add_argument(
+                p[0],
+                p[1],
+                **d)
+        parser.add_argument(
+            'source',
+            type=str,
+            help='Pleiades places JSON dump (may be gzipped)')
+        args = parser.parse_args()
+        if args.loglevel is not None:
+            args_log_level = re.sub('\s+', '', args.loglevel.strip().upper())
+            try:
+                log_level = getattr(logging, args_log_level)
+            except AttributeError:
+                logging.error(
+                    "command line option to set log_level failed "
+                    "because '%s' is not a valid level name; using %s"
+                    % (args_log_level, log_level_name))
+        if args.veryverbose:
+            log_level = logging.DEBUG
+        elif args.verbose:
+            log_level = logging.INFO
+        log_level_name = logging.getLevelName(log_level)
+        logging.getLogger().setLevel(log_level)
+        fn_this = inspect.stack()[0][1].strip()
+        title_this = __doc__.strip()
+        logging.info(': '.join((fn_this, title_this)))
+        if log_level != DEFAULT_LOG_LEVEL:
+            logging.warning(
+                "logging level changed to %s via command line option"
+                % log_level_name)
+        else:
+            logging.info("using default logging level: %s" % log_level_name)
+        logging.debug("command line: '%s'" % ' '.join(sys.argv))
+        main(args)
+        sys.exit(0)
+    except KeyboardInterrupt as e:  # Ctrl-C
+        raise e
+    except SystemExit as e:  # sys.exit()
+        raise e
+    except Exception as e:
+        print("ERROR, UNEXPECTED EXCEPTION")
+        print(str(e))
+        traceback.print_exc()
+        os._exit(1)
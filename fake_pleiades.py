@@ -0,0 +1,215 @@
+"""Local stand-in for the Pleiades web site.
+
+Defines the class FakePleiades, a small threaded HTTP server that answers
+the two kinds of request this package makes of Pleiades from fixture data
+(e.g., a Pleiades places JSON dump; see snapshot.read_dump):
+
+ - /places/<pid>/json: the place's JSON (404 if there is no such place)
+ - /places/<pid>/<slug>: a page for a name, location, or connection in the
+   place (404 if the slug is not in use)
+
+Latency and errors can be injected to simulate network conditions, so that
+tests and benchmarks of the PleiadesName HTTP paths can run offline. Point a
+place_registry.PlaceRegistry (or the "-u" option of massage-names.py) at the
+server's places_url to use it.
+
+"""
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import inspect
+import json
+import logging
+import random
+from snapshot import SLUG_KINDS, read_dump
+import threading
+import time
+
+
+class FakePleiades:
+    """Serve Pleiades place JSON and slug pages from fixture data."""
+
+    def __init__(
+        self,
+        places: list,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        error_status: int = 503,
+        drop_rate: float = 0,
+        seed=None,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        """Create (but do not start) a server.
+
+        Args:
+            places: list of place dictionaries, as in a Pleiades places JSON
+                dump ("id", "title", "names", "locations", "connections")
+            latency: seconds to wait before answering each request
+            jitter: up to this many further seconds are added at random
+            error_rate: fraction of requests answered with error_status
+            error_status: HTTP status code of injected errors
+            drop_rate: fraction of requests whose connection is closed
+                without any response
+            seed: seed for the random number generator
+            host, port: address to listen on (port 0: any free port)
+
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self.drops = 0
+        self.not_modified = 0
+        self._places = {}
+        self._slugs = {}
+        for place in places:
+            pid = str(place['id'])
+            self._places[pid] = json.dumps(place).encode('utf-8')
+            slugs = set()
+            for kind in SLUG_KINDS:
+                for item in place.get(kind, []) or []:
+                    try:
+                        slugs.add(item['id'])
+                    except (KeyError, TypeError):
+                        continue
+            self._slugs[pid] = slugs
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_dump(cls, dump_fname: str, **kwargs):
+        """Create a server for the places in a Pleiades places JSON dump."""
+        return cls(read_dump(dump_fname), **kwargs)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def base_url(self):
+        """Get the URL at which the server answers (cf. PLEIADES_BASE_URL)."""
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    @property
+    def places_url(self):
+        """Get the base URL of places (cf. PLEIADES_PLACES_URL)."""
+        return '/'.join((self.base_url, 'places'))
+
+    def start(self):
+        """Start serving in a background thread."""
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(
+            'serving {} places at {}'.format(
+                len(self._places), self.base_url))
+
+    def stop(self):
+        """Stop serving."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def stats(self):
+        """Get a dictionary of request counters."""
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'drops': self.drops,
+            'not_modified': self.not_modified,
+        }
+
+    def respond(self, path: str):
+        """Get the status code and body with which to answer a GET of path.
+
+        Returns:
+            A tuple (status, body); body is None if the connection is to be
+            dropped instead.
+
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.drop_rate:
+            with self._lock:
+                self.drops += 1
+            return (None, None)
+        if roll < self.drop_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return (self.error_status, b'')
+        parts = path.split('?')[0].strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'places':
+            return (404, b'')
+        pid, leaf = parts[1:]
+        try:
+            place = self._places[pid]
+        except KeyError:
+            return (404, b'')
+        if leaf == 'json':
+            return (200, place)
+        if leaf in self._slugs[pid]:
+            return (200, '<html><body>{}</body></html>'.format(
+                leaf).encode('utf-8'))
+        return (404, b'')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer requests on behalf of the FakePleiades attached to server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        fake = self.server.fake
+        status, body = fake.respond(self.path)
+        if body is None:
+            self.close_connection = True
+            return
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            with fake._lock:
+                fake.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        if self.path.endswith('/json'):
+            self.send_header('Content-Type', 'application/json')
+        else:
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger = logging.getLogger(':'.join((__name__, 'FakePleiades')))
+        logger.debug(format % args)
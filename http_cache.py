@@ -0,0 +1,304 @@
+"""Persistent, size-bounded cache of HTTP responses.
+
+Defines the class ResponseCache, which keeps successful (200) and "not found"
+(404) responses in an SQLite database shared by every run and process that
+points at the same file, and the function fetch(), which is how names.py and
+friends get URLs through it (one request at a time per URL; see
+singleflight.py).
+
+Entries expire after a configurable time-to-live (404s may have their own,
+shorter one) and the least-recently used entries are evicted when the cache
+grows beyond its entry or byte limits. Hit and miss counts are kept for
+reporting.
+
+"""
+import inspect
+import json
+import logging
+import os
+import requests
+from pleiades_client import get_client
+from requests.structures import CaseInsensitiveDict
+from singleflight import SingleFlight
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'pleiades-batching', 'http.sqlite')
+DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+# 404s mostly answer "is this slug free?", which can change at any moment
+DEFAULT_NEGATIVE_TTL = 10 * 60  # seconds
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CACHEABLE = [requests.codes.ok, requests.codes.not_found]
+EVICT_INTERVAL = 100  # check size limits after this many stores
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS responses ('
+    'url TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, '
+    'body BLOB NOT NULL, size INTEGER NOT NULL, fetched REAL NOT NULL, '
+    'accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)',
+]
+
+
+class CachedResponse:
+    """Stand-in for a requests.Response object read back from the cache."""
+
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: dict, body):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = body
+        self.encoding = 'utf-8'
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+
+class ResponseCache:
+    """Keep HTTP responses on disk for re-use across runs and processes."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """Open (or create) a response cache.
+
+        Args:
+            path: filepath of the SQLite cache database
+            ttl: number of seconds a cached 200 response stays fresh
+            negative_ttl: number of seconds a cached 404 response stays
+                fresh (None: same as ttl)
+            max_entries: maximum number of responses to keep
+            max_bytes: maximum total size of response bodies to keep
+
+        """
+        self.path = path
+        self.ttl = ttl
+        if negative_ttl is None:
+            negative_ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        dirname = os.path.dirname(path)
+        if dirname != '':
+            os.makedirs(dirname, exist_ok=True)
+
+    @property
+    def db(self):
+        """Get a connection to the database (one per process)."""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False,
+                isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def get(self, url: str):
+        """Get a fresh cached response for url, or None if there isn't one."""
+        now = time.time()
+        with self._lock:
+            row = self.db.execute(
+                'SELECT status, headers, body, fetched FROM responses '
+                'WHERE url = ?', (url,)).fetchone()
+            if row is not None:
+                status, headers, body, fetched = row
+                if status == requests.codes.not_found:
+                    ttl = self.negative_ttl
+                else:
+                    ttl = self.ttl
+                if now - fetched > ttl:
+                    row = None
+                else:
+                    self.db.execute(
+                        'UPDATE responses SET accessed = ? WHERE url = ?',
+                        (now, url))
+            if row is None:
+                self.misses += 1
+                return None
+            if status == requests.codes.not_found:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        return CachedResponse(url, status, json.loads(headers), body)
+
+    def validators(self, url: str):
+        """Get the ETag and Last-Modified headers of any cached copy of url.
+
+        Returns:
+            A tuple (etag, last_modified); either may be None. Stale entries
+            count, since they are what conditional requests revalidate.
+
+        """
+        with self._lock:
+            row = self.db.execute(
+                'SELECT headers FROM responses WHERE url = ? AND status = ?',
+                (url, requests.codes.ok)).fetchone()
+        if row is None:
+            return (None, None)
+        headers = CaseInsensitiveDict(json.loads(row[0]))
+        return (headers.get('ETag'), headers.get('Last-Modified'))
+
+    def revalidate(self, url: str):
+        """Mark the cached copy of url fresh again (after a 304 response).
+
+        Returns:
+            The cached response, or None if there isn't one after all.
+
+        """
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                'UPDATE responses SET fetched = ?, accessed = ? WHERE url = ?',
+                (now, now, url))
+            row = self.db.execute(
+                'SELECT status, headers, body FROM responses WHERE url = ?',
+                (url,)).fetchone()
+            if row is None:
+                return None
+            self.revalidations += 1
+        status, headers, body = row
+        return CachedResponse(url, status, json.loads(headers), body)
+
+    def put(self, url: str, response):
+        """Store response for url, if its status code is cacheable."""
+        if response.status_code not in CACHEABLE:
+            return
+        now = time.time()
+        body = response.content
+        if response.status_code != requests.codes.ok:
+            body = b''  # presence of a 404 is all that matters
+        headers = json.dumps(dict(response.headers))
+        with self._lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, response.status_code, headers, body, len(body), now,
+                 now))
+            self.stores += 1
+            if self.stores % EVICT_INTERVAL == 0:
+                self._evict()
+
+    def evict(self):
+        """Drop least-recently used entries until within size limits."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        count, size = self.db.execute(
+            'SELECT COUNT(*), TOTAL(size) FROM responses').fetchone()
+        rows = self.db.execute(
+            'SELECT url, size FROM responses ORDER BY accessed')
+        doomed = []
+        for url, row_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((url,))
+            count -= 1
+            size -= row_size
+        if len(doomed) > 0:
+            self.db.executemany('DELETE FROM responses WHERE url = ?', doomed)
+            self.evictions += len(doomed)
+            logger.debug(
+                'evicted {} entries from {}'.format(len(doomed), self.path))
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self.db.execute('DELETE FROM responses')
+
+    def stats(self):
+        """Get a dictionary of cache counters."""
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'revalidations': self.revalidations,
+        }
+
+
+CACHE = None
+FLIGHTS = SingleFlight()
+
+
+def install_cache(path: str = DEFAULT_CACHE_PATH, **kwargs):
+    """Create the response cache used by fetch() (see ResponseCache)."""
+    global CACHE
+    CACHE = ResponseCache(path, **kwargs)
+    return CACHE
+
+
+def get_cache():
+    """Get the response cache used by fetch(), installing the default."""
+    if CACHE is None:
+        install_cache()
+    return CACHE
+
+
+def fetch(url: str):
+    """GET a URL, answering from the response cache whenever possible.
+
+    Concurrent calls for the same URL are coalesced: only one of them looks
+    in the cache or goes to the network, and the others share its response.
+    Cache misses are fetched with the shared pleiades_client.PleiadesClient;
+    a stale cached copy is revalidated with a conditional request.
+
+    Args:
+        url: URL to fetch
+
+    Returns:
+        A requests.Response or CachedResponse object.
+
+    Exceptions raised:
+        - requests.exceptions.ConnectionError or Timeout on cache misses
+          that could not be fetched.
+
+    """
+    return FLIGHTS.do(url, _fetch, url)
+
+
+def _fetch(url: str):
+    cache = get_cache()
+    r = cache.get(url)
+    if r is None:
+        etag, last_modified = cache.validators(url)
+        r = get_client().get(url, etag=etag, last_modified=last_modified)
+        if r.status_code == requests.codes.not_modified:
+            cached = cache.revalidate(url)
+            if cached is not None:
+                return cached
+            r = get_client().get(url)
+        cache.put(url, r)
+    return r
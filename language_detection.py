@@ -0,0 +1,109 @@
+"""Memoized language detection for attested name forms.
+
+Defines the class LanguageDetection, which wraps the "polyglot" language
+detector used to check the attested forms of Pleiades names against their
+declared language tags. Results are memoized per (normalized) string in an
+LRU cache, since the same attested forms recur across many places, and a
+batch method classifies many strings in one call. A cheap pre-check (using
+the script table in codepoints.py) skips polyglot entirely when every letter
+of a string is in the (non-Latin) script that the declared language tag
+implies. Latin script is shared by too many languages for the pre-check to
+say anything, so Latin strings are always passed to polyglot.
+
+DETECTION is the instance shared by all PleiadesName objects.
+
+"""
+from codepoints import SCRIPT_NAMES, TABLE
+from collections import namedtuple
+from functools import lru_cache
+from polyglot.detect import Detector as LanguageDetector
+import threading
+
+DEFAULT_CACHE_SIZE = 65536
+SCRIPT_CODES = {v: k for k, v in SCRIPT_NAMES.items()}
+UNSCREENED_SCRIPTS = ['Latn']
+
+Detection = namedtuple('Detection', ['reliable', 'languages'])
+
+
+def script_of(text: str):
+    """Get the ISO 15924 code of the one script all letters in text use.
+
+    Returns:
+        A script code (e.g., 'Arab'), or None if text has no letters, mixes
+        scripts, or uses a script not listed in SCRIPT_NAMES.
+
+    """
+    scripts = TABLE.scripts_used(text)
+    if len(scripts) != 1:
+        return None
+    return next(iter(scripts))
+
+
+class LanguageDetection:
+    """Detect the languages of strings with polyglot, memoizing results."""
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        """Create a detection service.
+
+        Args:
+            cache_size: maximum number of strings whose results are kept
+
+        """
+        self.prescreened = 0
+        self._lock = threading.Lock()
+        self.detect = lru_cache(maxsize=cache_size)(self._detect)
+
+    def _detect(self, text: str):
+        """Detect the languages of text.
+
+        Returns:
+            A Detection tuple: whether polyglot thinks its identification is
+            reliable, and the tuple of language codes it found (less 'un').
+
+        """
+        detector = LanguageDetector(text)
+        return Detection(
+            detector.reliable,
+            tuple(l.code for l in detector.languages if l.code != 'un'))
+
+    def detect_batch(self, texts):
+        """Detect the languages of many strings, each distinct one once.
+
+        Returns:
+            A dictionary of Detection tuples keyed by string.
+
+        """
+        return {text: self.detect(text) for text in dict.fromkeys(texts)}
+
+    def prescreen(self, text: str, script: str):
+        """Can detection be skipped because text is wholly in script?
+
+        Args:
+            text: string to check
+            script: ISO 15924 code of the script implied by the declared
+                language tag (e.g., PleiadesName.language_script)
+
+        """
+        if script in UNSCREENED_SCRIPTS or script_of(text) != script:
+            return False
+        with self._lock:
+            self.prescreened += 1
+        return True
+
+    def stats(self):
+        """Get a dictionary of detection counters."""
+        info = self.detect.cache_info()
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'cached': info.currsize,
+            'prescreened': self.prescreened,
+        }
+
+    def clear(self):
+        """Forget all memoized results."""
+        self.detect.cache_clear()
+
+
+DETECTION = LanguageDetection()
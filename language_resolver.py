@@ -0,0 +1,172 @@
+"""Memoized resolution of IANA language tags.
+
+Defines the class LanguageTagResolver, which works out everything this
+package needs to know about a language tag (whether it is valid, the script
+it implies, and descriptions of its language and script) once per distinct
+tag and keeps the answer, since a batch of names uses only a handful of
+tags. Answers can be saved to and loaded from a compact JSON lookup file
+(see build_lookup() and build-language-lookup.py); tags found there never
+touch the "language_tags" registry, which is only imported when a tag is
+missing from the lookup.
+
+RESOLVER is the resolver shared by names.py and massage-calcs-names.py.
+
+"""
+from collections import namedtuple
+import inspect
+import json
+import logging
+import threading
+
+TagInfo = namedtuple(
+    'TagInfo',
+    ['valid', 'script', 'language_description', 'script_description'])
+
+
+def resolve_from_registry(tag: str):
+    """Resolve a language tag against the language_tags registry.
+
+    Returns:
+        A TagInfo tuple. script is the ISO 15924 code of the script implied
+        by the tag ('None' if the registry names none), or None if the tag
+        could not be resolved at all. The descriptions are '' if unknown;
+        script_description is only given for tags with a script subtag.
+
+    """
+    from language_tags import tags as language_tags
+    valid = language_tags.check(tag)
+    try:
+        # get script subtag that is explicit in the tag
+        script = str(language_tags.tag(tag).script.format)
+    except AttributeError:
+        # there was no explicit script subtag
+        try:
+            # get default script subtag (suppress script)
+            script = str(language_tags.language(tag).script)
+        except AttributeError:
+            script = None
+    descriptions = language_tags.description(tag)
+    language_description = ''
+    script_description = ''
+    if len(descriptions) > 1 and '-' in tag:
+        subtags = tag.split('-')
+        languages = [s for s in subtags if len(s) < 4 and s.lower() == s]
+        scripts = [s for s in subtags if len(s) == 4]
+        if len(languages) > 0:
+            language_description = language_tags.description(
+                languages[0])[0]
+        if len(scripts) > 0:
+            script_description = language_tags.description(scripts[0])[0]
+    elif len(descriptions) > 0:
+        language_description = descriptions[0]
+    return TagInfo(valid, script, language_description, script_description)
+
+
+class LanguageTagResolver:
+    """Resolve language tags once each and remember the answers."""
+
+    def __init__(self, lookup_path: str = None):
+        """Create a resolver.
+
+        Args:
+            lookup_path: filepath of a lookup file to load (see load)
+
+        """
+        self.lookups = 0
+        self.resolutions = 0
+        self._tags = {}
+        self._lock = threading.Lock()
+        if lookup_path is not None:
+            self.load(lookup_path)
+
+    def __contains__(self, tag: str):
+        return tag in self._tags
+
+    def __len__(self):
+        return len(self._tags)
+
+    def resolve(self, tag: str):
+        """Get the TagInfo for a language tag (see resolve_from_registry)."""
+        self.lookups += 1
+        try:
+            return self._tags[tag]
+        except KeyError:
+            pass
+        info = resolve_from_registry(tag)
+        with self._lock:
+            self._tags[tag] = info
+            self.resolutions += 1
+        return info
+
+    def check(self, tag: str):
+        """Is tag a valid IANA language tag?"""
+        return self.resolve(tag).valid
+
+    def script(self, tag: str):
+        """Get the ISO 15924 code of the script implied by a language tag.
+
+        Exceptions raised:
+            - AttributeError: the tag could not be resolved.
+
+        """
+        script = self.resolve(tag).script
+        if script is None:
+            raise AttributeError(
+                'Cannot determine the script of language tag "{}".'
+                ''.format(tag))
+        return script
+
+    def load(self, path: str):
+        """Add the tags in a lookup file written by save()."""
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        with self._lock:
+            for tag, fields in entries.items():
+                self._tags[tag] = TagInfo(*fields)
+        logger.info('loaded {} language tags from {}'.format(
+            len(entries), path))
+
+    def save(self, path: str):
+        """Write every tag resolved so far to a compact lookup file."""
+        with self._lock:
+            entries = {tag: list(info) for tag, info in self._tags.items()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(
+                entries, f, ensure_ascii=False, sort_keys=True,
+                separators=(',', ':'))
+
+    def stats(self):
+        """Get a dictionary of resolver counters."""
+        return {
+            'tags': len(self._tags),
+            'lookups': self.lookups,
+            'resolutions': self.resolutions,
+        }
+
+
+def build_lookup(path: str, tags=None):
+    """Precompile a lookup file from the language_tags registry.
+
+    Args:
+        path: filepath to which to write the lookup file
+        tags: iterable of language tags to include (default: every language
+            subtag in the registry)
+
+    Returns:
+        The LanguageTagResolver used to build the file.
+
+    """
+    if tags is None:
+        from language_tags import data
+        tags = data.get('language').keys()
+    resolver = LanguageTagResolver()
+    for tag in tags:
+        resolver.resolve(tag)
+    resolver.save(path)
+    return resolver
+
+
+RESOLVER = LanguageTagResolver()
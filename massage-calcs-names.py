@@ -3,21 +3,26 @@ prepare calcs names json for upload
 """
 
 import argparse
+from batch_romanization import romanize_batch
 from functools import wraps
 import inspect
 import json
-from language_tags import tags
+from language_resolver import RESOLVER
 import logging
+from names import language_script
 import os
 from polyglot.text import Text as Polytext
-from polyglot.transliteration import Transliterator
 from polyglot.detect import Detector as Polydetector
 import re
+from romanization_cache import banalize
+from romanization_cache import install_cache as install_romanization_cache
+from romanization_cache import DEFAULT_ROMANIZATION_CACHE_PATH
+from snapshot import PleiadesSnapshot
 import string
 import sys
 import traceback
-import unicodedata
-from unidecode import unidecode
+from transliteration import TRANSLITERATORS
+from unicode_normalization import normalize_batch
 
 DEFAULT_LOG_LEVEL = logging.WARNING
 POSITIONAL_ARGUMENTS = [
@@ -27,6 +32,16 @@ POSITIONAL_ARGUMENTS = [
     ['-v', '--verbose', False, 'verbose output (logging level == INFO)'],
     ['-w', '--veryverbose', False,
         'very verbose output (logging level == DEBUG)'],
+    ['-p', '--snapshot', '',
+        'Pleiades snapshot store to check pids and slugs against (see '
+        'build-snapshot.py)'],
+    ['-m', '--romanization-cache', DEFAULT_ROMANIZATION_CACHE_PATH,
+        'romanization cache file'],
+    ['-j', '--jobs', 0,
+        'number of worker processes for romanizing languages in parallel'],
+    ['-g', '--language-lookup', '',
+        'language tag lookup file to load and update (see '
+        'build-language-lookup.py)'],
 ]
 NOPUNCT = str.maketrans(
     {key: None for key in string.punctuation if key != "-"})
@@ -57,10 +72,43 @@ def main(args):
     logger = logging.getLogger(sys._getframe().f_code.co_name)
     src = args.source
     dest = args.destination
+    romanizations = install_romanization_cache(args.romanization_cache)
+    if args.language_lookup != '' and os.path.isfile(args.language_lookup):
+        RESOLVER.load(args.language_lookup)
 
     # read in the name data
     names = json.load(open(src, 'r'))
     logger.info('read {} names from {}'.format(len(names), src))
+    if args.snapshot != '':
+        snapshot = PleiadesSnapshot(args.snapshot)
+    else:
+        snapshot = None
+
+    # normalize the attested and transliterated columns in bulk
+    keys = list(names.keys())
+    normalized, divergences = normalize_batch(
+        [names[k]['attested'] for k in keys])
+    attested_forms = dict(zip(keys, normalized))
+    attested_divergences = {keys[d.index]: d for d in divergences}
+    normalized, divergences = normalize_batch(
+        [names[k]['transliterated'] for k in keys])
+    transliterated_forms = dict(zip(keys, normalized))
+    transliterated_divergences = {keys[d.index]: d for d in divergences}
+
+    # romanize the attested forms in bulk, one language at a time
+    records = []
+    for k, v in names.items():
+        attested = attested_forms[k]
+        if v['language'] != '' and attested != '':
+            records.append((v['language'], attested))
+    romanized_forms = dict(
+        zip(records, romanize_batch(records, workers=int(args.jobs))))
+
+    def romanize_result(language, attested):
+        value, exc = romanized_forms[(language, attested)]
+        if exc is not None:
+            raise exc
+        return value
 
     complete_names = {}
     for k, v in names.items():
@@ -68,13 +116,13 @@ def main(args):
         logger.debug('\n\n--------------------------------------------------')
         logger.debug('Processing {}'.format(k))
 
-        attested = unicodedata.normalize('NFC', v['attested'])
-        compatibility = unicodedata.normalize('NFKC', v['attested'])
-        if attested != compatibility:
+        attested = attested_forms[k]
+        if k in attested_divergences:
             logger.warning(
                 'Possible Unicode weirdness: canonical (NFC) form "{}" '
                 'does not match compatibility (NFCK) form "{}". Using '
-                'NFC for ATTESTED name.'.format(attested, compatibility))
+                'NFC for ATTESTED name.'.format(
+                    attested, attested_divergences[k].compatibility))
         if len(attested) == 0:
             logger.warning(
                 'No ATTESTED value was provided in {}. It will be left blank.'
@@ -87,36 +135,26 @@ def main(args):
                 '{} will be ignored.'
                 ''.format(k))
             continue
-        if not tags.check(language):
+        if not RESOLVER.check(language):
             logger.error(
                 '"{}" does not validate as an IANA language code. {} will be '
                 'ignored'.format(language, k))
             continue
 
-        romanized = unicodedata.normalize('NFC', v['transliterated'])
-        compatibility = unicodedata.normalize('NFKC', v['transliterated'])
-        if romanized != compatibility:
+        romanized = transliterated_forms[k]
+        if k in transliterated_divergences:
             logger.warning(
                 'Possible Unicode weirdness: canonical (NFC) form "{}" '
                 'does not match compatibility (NFCK) form "{}". Using '
-                'NFC for ROMANIZED name.'.format(romanized, compatibility))
+                'NFC for ROMANIZED name.'.format(
+                    romanized, transliterated_divergences[k].compatibility))
         if romanized == '':
             if len(attested) > 0:
                 logger.info(
                     'No ROMANIZED form was provided in {}. Trying to create '
                     'one...'
                     ''.format(k))
-                try:
-                    # get script subtag that is explicit in the tag
-                    iana_script = tags.tag(language).script.format
-                except AttributeError:
-                    # there was no explicit script subtag
-                    try:
-                        # get default script subtag (suppress script)
-                        iana_script = tags.language(language).script
-                    except:
-                        raise
-                iana_script = str(iana_script)
+                iana_script = language_script(language)
                 if iana_script == 'Latn':
                     romanized = attested
                     logger.info(
@@ -124,10 +162,7 @@ def main(args):
                         'it will be copied verbatim to ROMANIZED'
                         ''.format(attested))
                 else:
-                    transliterator = Transliterator(
-                        source_lang=language, target_lang='en')
-                    romanized = transliterator.transliterate(attested)
-                    romanized = string.capwords(romanized)
+                    romanized = romanize_result(language, attested)
                     logger.info(
                         '... created ROMANIZED form "{}" using the '
                         '"polyglot" package'.format(romanized))
@@ -137,16 +172,11 @@ def main(args):
                     'cannot add this name. Ignoring {}.'.format(k))
                 continue
 
-        banalized = unicodedata.normalize(
-            'NFC', unidecode(
-                unicodedata.normalize('NFKD', romanized)))
+        banalized = banalize(romanized)
         slug = sluggify(banalized)
         polyfied = ''
-        if 'Latn' not in language:
-            transliterator = Transliterator(
-                source_lang=language, target_lang='en')
-            polyfied = transliterator.transliterate(attested)
-            polyfied = string.capwords(polyfied)
+        if 'Latn' not in language and attested != '':
+            polyfied = romanize_result(language, attested)
             if polyfied not in romanized:
                 logger.info(
                     'adding polyfied form "{}" to romanized "{}"'
@@ -174,6 +204,17 @@ def main(args):
             logger.error('No pid was specified. Ignoring {}.'
                          ''.format(k))
             continue
+        if snapshot is not None:
+            if not snapshot.has_pid(pid):
+                logger.error(
+                    'pid {} is not in the Pleiades snapshot. Ignoring {}.'
+                    ''.format(pid, k))
+                continue
+            if snapshot.has_slug(pid, slug):
+                logger.error(
+                    'slug "{}" is already in use in Pleiades place {}. '
+                    'Ignoring {}.'.format(slug, pid, k))
+                continue
 
         references = []
         for i in range(1, 3):
@@ -228,6 +269,11 @@ def main(args):
 
     json.dump(complete_names, open(dest, 'w'), indent=4,
               ensure_ascii=False, sort_keys=True)
+    logger.info('transliterators: {}'.format(TRANSLITERATORS.stats()))
+    logger.info('romanization cache: {}'.format(romanizations.stats()))
+    logger.info('language tags: {}'.format(RESOLVER.stats()))
+    if args.language_lookup != '':
+        RESOLVER.save(args.language_lookup)
 
 
 def sluggify(raw):
@@ -4,16 +4,40 @@ Script to validate and augment Pleiades names data for batch upload create.
 
 from arglogger import arglogger
 import argparse
+from batch_romanization import romanize_batch
+from concurrent.futures import ProcessPoolExecutor
+from csv_index import CSVIndex
+from csv_utilities import DIALECT_CACHE, detect_csv, open_csv, read_csv
+from csv_utilities import test_csv
+from http_cache import install_cache, DEFAULT_CACHE_PATH, DEFAULT_TTL
+from http_cache import DEFAULT_NEGATIVE_TTL
+from http_cache import DEFAULT_MAX_ENTRIES, FLIGHTS
 import inspect
 import json
+from language_detection import DETECTION
+from language_resolver import RESOLVER
 import logging
-from names import PleiadesName
+import multiprocessing
+from name_table import NameTable, VOCABULARY_COLUMNS
+from names import PLACES, PLEIADES_BASE_URL, language_script
 import os
 from os.path import abspath, basename, realpath, splitext
+from parallel_csv import read_csv_parallel
+from pleiades_client import get_client, install_client
 from pprint import pformat
+from prefetch import PrefetchPlan
 import re
+from romanization_cache import install_cache as install_romanization_cache
+from romanization_cache import DEFAULT_ROMANIZATION_CACHE_PATH
+from sanitization import SANITIZER
+from snapshot import PleiadesSnapshot
 import sys
+import time
 import traceback
+from transliteration import TRANSLITERATORS
+from urllib.error import URLError
+from validation import validate_names
+from vocabulary_store import VOCABULARY
 
 DEFAULT_LOG_LEVEL = logging.WARNING
 POSITIONAL_ARGUMENTS = [
@@ -27,10 +51,45 @@ POSITIONAL_ARGUMENTS = [
     ['-s', '--sluggify', False, 'generate slugs'],
     ['-d', '--dialect', '', 'CSV dialect to use (default: sniff)'],
     ['-a', '--abstract', False, 'generate summaries'],
-    ['-e', '--encoding', 'utf-8', 'csv file encoding']
+    ['-e', '--encoding', 'utf-8', 'csv file encoding'],
+    ['-p', '--snapshot', '',
+        'Pleiades snapshot store to check pids and slugs against (see '
+        'build-snapshot.py)'],
+    ['-f', '--http-fallback', False,
+        'check pids and slugs missing from the snapshot via HTTP (slugs to '
+        'be created are nearly always missing from it, so this costs about '
+        'one request per name)'],
+    ['-o', '--offline', False,
+        'do not fall back to HTTP for pids and slugs missing from snapshot '
+        '(the default; overrides -f)'],
+    ['-c', '--concurrency', 8, 'number of simultaneous HTTP requests'],
+    ['-k', '--cache', DEFAULT_CACHE_PATH, 'HTTP response cache file'],
+    ['-t', '--cache-ttl', DEFAULT_TTL,
+        'number of seconds cached HTTP responses stay fresh'],
+    ['-x', '--cache-negative-ttl', DEFAULT_NEGATIVE_TTL,
+        'number of seconds cached 404 responses (e.g., for slugs not yet in '
+        'use) stay fresh'],
+    ['-z', '--cache-size', DEFAULT_MAX_ENTRIES,
+        'maximum number of cached HTTP responses'],
+    ['-u', '--pleiades-url', PLEIADES_BASE_URL,
+        'base URL of the Pleiades web site (e.g., of fake-pleiades.py)'],
+    ['-m', '--romanization-cache', DEFAULT_ROMANIZATION_CACHE_PATH,
+        'romanization cache file'],
+    ['-j', '--jobs', 0,
+        'number of worker processes for romanizing languages in parallel'],
+    ['-g', '--language-lookup', '',
+        'language tag lookup file to load and update (see '
+        'build-language-lookup.py)'],
+    ['-n', '--workers', 0,
+        'number of worker processes among which to divide the names'],
+    ['-i', '--nameids', '',
+        'process only these nameids (comma-separated, or a file listing one '
+        'per line), reading CSV files through sidecar indexes (see '
+        'csv_index.py)'],
 ]
 
 SUPPORTED_EXTENSIONS = ['.csv', '.json']
+CHUNKS_PER_WORKER = 4
 
 
 @arglogger
@@ -46,8 +105,24 @@ def read_json(fname: str, dialect: None, encoding='utf-8'):
 
 
 @arglogger
-def test_file(src: str, dialect_arg=None, encoding='utf-8'):
-    """Test if this is a file we can do something with."""
+def open_file(fname: str, dialect_arg=None, encoding='utf-8'):
+    """Check a file and open it for reading (see test_file).
+
+    Returns:
+        A tuple (dialect, field_names, rows), as for csv_utilities.open_csv.
+
+    """
+    func_s = 'open_{}'.format(check_extension(fname)[1:])
+    return globals()[func_s](fname, dialect_arg, encoding)
+
+
+@arglogger
+def open_json(fname: str, dialect_arg=None, encoding='utf-8'):
+    raise NotImplementedError('JSON input file support is not yet available.')
+
+
+def check_extension(src: str):
+    """Get the extension of a file we can do something with."""
     src_fname, src_ext = splitext(src)
     if src_ext == '.file':
         raise ValueError(
@@ -56,14 +131,19 @@ def test_file(src: str, dialect_arg=None, encoding='utf-8'):
         raise ValueError(
             'Source filename {} needs an extension from the list {}.'
             ''.format(src, SUPPORTED_EXTENSIONS))
-    elif src_ext in SUPPORTED_EXTENSIONS:
-        func_s = 'test_{}'.format(src_ext[1:])
-        return globals()[func_s](src, dialect_arg, encoding)
-    else:
+    elif src_ext not in SUPPORTED_EXTENSIONS:
         raise ValueError(
             'Input filename has an unsupported extension ({}). Only these '
             'are supported: {}.'
             ''.format(src, SUPPORTED_EXTENSIONS))
+    return src_ext
+
+
+@arglogger
+def test_file(src: str, dialect_arg=None, encoding='utf-8'):
+    """Test if this is a file we can do something with."""
+    func_s = 'test_{}'.format(check_extension(src)[1:])
+    return globals()[func_s](src, dialect_arg, encoding)
 
 
 @arglogger
@@ -71,10 +151,245 @@ def test_json(fname: str, **kwargs):
     raise NotImplementedError('JSON input file support is not yet available.')
 
 
+def parse_nameids(value: str):
+    """Get the nameids given with --nameids, or None if there are none."""
+    if value == '':
+        return None
+    if os.path.isfile(value):
+        with open(value, 'r', encoding='utf-8') as f:
+            value = f.read().replace('\n', ',')
+    return [v.strip() for v in value.split(',') if v.strip() != '']
+
+
+def read_nameids(
+    fname: str, nameids: list, dialect_arg=None, encoding='utf-8'
+):
+    """Read the rows of a file for some nameids only.
+
+    CSV files are read through their sidecar nameid index (built first if it
+    is missing or stale), so only the rows wanted are parsed. Files that
+    cannot be indexed are read in full.
+
+    Returns:
+        A list of row dictionaries, in file order.
+
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    index = None
+    if check_extension(fname) == '.csv':
+        try:
+            index = CSVIndex.open(fname, 'nameid', dialect_arg, encoding)
+        except ValueError as exc:
+            logger.warning('{}; reading the whole file'.format(exc))
+    if index is not None:
+        with index:
+            missing = [v for v in nameids if v not in index]
+            rows = index.rows(nameids)
+    else:
+        dialect, field_names, all_rows = open_file(
+            fname, dialect_arg, encoding)
+        wanted = set(nameids)
+        rows = [row for row in all_rows if row.get('nameid') in wanted]
+        found = {row['nameid'] for row in rows}
+        missing = [v for v in nameids if v not in found]
+    if len(missing) > 0:
+        logger.warning(
+            'nameids not found in {}: {}'.format(fname, ', '.join(missing)))
+    return rows
+
+
 def normalize_space(v: str):
     return ' '.join(v.split()).strip()
 
 
+def name_title(item: dict):
+    """Get the romanized (or else attested) form of a name row for logs."""
+    try:
+        return item['romanized']
+    except KeyError:
+        return item.get('attested', '')
+
+
+def massage_name(
+    item: dict, pn, exc, time_periods: dict, romanize=False, sluggify=False,
+    abstract=False
+):
+    """Augment one validated name and export it.
+
+    Args:
+        item: the name's input row (including "nameid")
+        pn: the PleiadesName made from item, or None if that failed
+        exc: the exception raised making pn (or None)
+        time_periods: dictionary of lists of time period terms keyed by
+            nameid
+        romanize, sluggify, abstract: generate romanized forms, slugs, and
+            summaries (see the -r, -s, and -a options)
+
+    Returns:
+        A tuple (d, records): the dictionary to write for the name (None if
+        it failed), and a list of (logging level, message) tuples to log.
+
+    """
+    nameid = item['nameid']
+    records = []
+    if exc is not None:
+        records.append((
+            logging.CRITICAL,
+            'validate-name:{}: Pleiades name creation failed because of '
+            'inadequate or inappropriate input '
+            'data in nameid={} ({}). Details: {}'
+            ''.format(nameid, nameid, name_title(item), exc)))
+        return (None, records)
+    try:
+        periods = time_periods[nameid]
+    except KeyError:
+        records.append((
+            logging.WARNING,
+            'No time periods defined for {}'.format(nameid)))
+    else:
+        pn.time_periods = periods
+    if romanize:
+        try:
+            pn.generate_romanized()
+        except ValueError as exc:
+            records.append((
+                logging.CRITICAL,
+                'generate-romanized:{}: Pleiades name creation failed '
+                'during attempted romanization '
+                'for nameid={} ({}). Details: {}'
+                ''.format(nameid, nameid, name_title(item), exc)))
+            return (None, records)
+    if sluggify:
+        try:
+            pn.generate_slug()
+        except ValueError as exc:
+            records.append((
+                logging.CRITICAL,
+                'generate-slug:{}: Pleiades name creation failed during '
+                'slug generation '
+                'for nameid={} ({}). Details: {}'
+                ''.format(nameid, nameid, name_title(item), exc)))
+            return (None, records)
+    if abstract:
+        try:
+            pn.generate_summary()
+        except ValueError as exc:
+            records.append((
+                logging.CRITICAL,
+                'generate-summary:{}: Pleiades name creation failed during '
+                'summary generation '
+                'for nameid={} ({}). Details: {}'
+                ''.format(nameid, nameid, name_title(item), exc)))
+            return (None, records)
+    d = pn.to_dict()
+    d['nameid'] = nameid
+    return (d, records)
+
+
+def preload(rows: list, romanize=False):
+    """Load what the workers will need before they are forked.
+
+    Vocabularies, language tags, and (if romanizing) transliteration models
+    loaded here are shared copy-on-write by worker processes that are
+    forked afterwards.
+
+    """
+    logger_name = ':'.join(
+        (basename(__file__), __name__, sys._getframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    for vocab_name in VOCABULARY_COLUMNS + ('time_periods',):
+        VOCABULARY.terms(vocab_name)
+    languages = {normalize_space(row.get('language', '')) for row in rows}
+    for language in sorted(languages - {''}):
+        try:
+            if romanize and language_script(language) != 'Latn':
+                TRANSLITERATORS.get(language)
+        except (AttributeError, URLError) as exc:
+            logger.warning(
+                'could not preload transliteration model for "{}": {}'
+                ''.format(language, exc))
+    logger.info(
+        'preloaded {} language tags and {} transliteration models'
+        ''.format(len(RESOLVER), TRANSLITERATORS.stats()['transliterators']))
+
+
+WORKER_STATE = None
+
+
+def init_worker(state: dict):
+    """Set up a worker process (see massage_in_workers).
+
+    The worker gets its own HTTP client, caches, and snapshot connection, so
+    that no socket or database connection inherited from the parent is used
+    by more than one process.
+
+    """
+    global WORKER_STATE
+    WORKER_STATE = state
+    install_client(**state['client'])
+    install_cache(**state['cache'])
+    install_romanization_cache(state['romanization_cache'])
+    PLACES.places_url = state['places_url']
+    if state['snapshot_path'] is not None:
+        state['snapshot'] = PleiadesSnapshot(state['snapshot_path'])
+    else:
+        state['snapshot'] = None
+
+
+def massage_chunk(items: list):
+    """Validate and massage a chunk of name rows in a worker process."""
+    state = WORKER_STATE
+    rows = [{k: v for k, v in item.items() if k != 'nameid'}
+            for item in items]
+    validated = validate_names(
+        rows,
+        plan=state['plan'],
+        snapshot=state['snapshot'],
+        http_fallback=state['http_fallback'])
+    return [
+        massage_name(
+            item, pn, exc, state['time_periods'], state['romanize'],
+            state['sluggify'], state['abstract'])
+        for item, (pn, exc) in zip(items, validated)]
+
+
+def massage_in_workers(items: list, state: dict, workers: int):
+    """Validate and massage name rows in a pool of worker processes.
+
+    Args:
+        items: name rows (including "nameid")
+        state: dictionary of everything the workers need (see main)
+        workers: number of worker processes
+
+    Returns:
+        A list with one massage_name() result per item, in input order.
+
+    Exceptions raised:
+        - ValueError: worker processes cannot be forked on this platform
+          (state holds objects, such as the prefetch plan, that cannot be
+          pickled for other start methods).
+
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise ValueError(
+            'massage-names.py worker processes require the "fork" start '
+            'method, which is not available on this platform.')
+    # share everything loaded so far with the workers, copy-on-write
+    context = multiprocessing.get_context('fork')
+    size = max(1, -(-len(items) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=init_worker,
+        initargs=(state,)
+    ) as executor:
+        for chunk_results in executor.map(massage_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
 @arglogger
 def main(args):
     """
@@ -86,13 +401,34 @@ def main(args):
     logger.debug('reading src')
     src = abspath(realpath(args.source))
     logger.debug('src: {}'.format(src))
-    dialect = test_file(src, encoding=args.encoding)
-    src_data, field_names = read_file(src, dialect, encoding=args.encoding)
+    if args.dialect != '':
+        dialect_arg = args.dialect
+    else:
+        dialect_arg = None
+    nameids = parse_nameids(args.nameids)
+    if nameids is not None:
+        src_data = read_nameids(src, nameids, dialect_arg, args.encoding)
+    elif int(args.workers) > 1 and check_extension(src) == '.csv':
+        # parse large files in chunks, in parallel
+        dialect, encoding = detect_csv(src, dialect_arg, args.encoding)
+        try:
+            src_data, field_names = read_csv_parallel(
+                src, dialect, encoding, workers=int(args.workers))
+        except ValueError as exc:
+            logger.warning('{} Reading {} serially.'.format(exc, src))
+            src_data, field_names = read_csv(src, dialect, encoding)
+    else:
+        dialect, field_names, src_rows = open_file(
+            src, dialect_arg, encoding=args.encoding)
+        src_data = list(src_rows)
     logger.debug('reading time_periods')
     time_periods = abspath(realpath(args.time_periods))
     logger.debug('time_periods: {}'.format(time_periods))
-    dialect = test_file(time_periods, encoding=args.encoding)
-    tpp, field_names = read_file(time_periods, dialect, encoding=args.encoding)
+    if nameids is not None:
+        tpp = read_nameids(time_periods, nameids, encoding=args.encoding)
+    else:
+        dialect, field_names, tpp = open_file(
+            time_periods, encoding=args.encoding)
     time_periods = {}
     for tp in tpp:
         logger.debug('tp: {}'.format(repr(tp)))
@@ -104,73 +440,132 @@ def main(args):
             time_periods[nameid] = [term]
     logger.debug('time_periods: {}'.format(repr(time_periods)))
     dest = abspath(realpath(args.destination))
-    names = []
+    cache_settings = {
+        'path': abspath(realpath(args.cache)),
+        'ttl': float(args.cache_ttl),
+        'negative_ttl': float(args.cache_negative_ttl),
+        'max_entries': int(args.cache_size),
+    }
+    cache = install_cache(**cache_settings)
+    PLACES.places_url = '/'.join((args.pleiades_url.rstrip('/'), 'places'))
+    romanizations = install_romanization_cache(
+        abspath(realpath(args.romanization_cache)))
+    if args.language_lookup != '':
+        language_lookup = abspath(realpath(args.language_lookup))
+        if os.path.isfile(language_lookup):
+            RESOLVER.load(language_lookup)
+    if args.snapshot != '':
+        snapshot = PleiadesSnapshot(abspath(realpath(args.snapshot)))
+    else:
+        snapshot = None
+    # trust the snapshot unless asked to check what it lacks over HTTP
+    http_fallback = args.http_fallback and not args.offline
+    rows = []
     for item in src_data:
         logger.debug(pformat(item))
-        nameid = item['nameid']
         d = {k: v for k, v in item.items() if k != 'nameid'}
         logger.debug(pformat(d))
-        try:
-            pn = PleiadesName(**d)
-        except (TypeError, ValueError) as exc:
-            try:
-                title = item['romanized']
-            except:
-                title = item['attested']
-            logger.critical(
-                'validate-name:{}: Pleiades name creation failed because of '
-                'inadequate or inappropriate input '
-                'data in nameid={} ({}). Details: {}'
-                ''.format(nameid, nameid, title, exc))
-            continue
-        try:
-            periods = time_periods[nameid]
-        except KeyError:
-            logger.warning('No time periods defined for {}'.format(nameid))
-        else:
-            pn.time_periods = periods
+        rows.append(d)
+    started = time.monotonic()
+    # set aside rows that fail the cheap column-wise checks before planning
+    # and running the language and HTTP checks on the rest
+    failures = NameTable.from_rows(rows).failures()
+    logger.info(
+        'triage: {} of {} rows failed local checks'
+        ''.format(len(failures), len(rows)))
+    survivors = [row for i, row in enumerate(rows) if i not in failures]
+    plan = PrefetchPlan(
+        snapshot=snapshot,
+        http_fallback=http_fallback,
+        generate_slugs=args.sluggify,
+        generate_summaries=args.abstract)
+    plan.extend(survivors)
+    logger.info(plan.report())
+    plan.execute(concurrency=int(args.concurrency))
+    workers = int(args.workers)
+    if (workers > 1
+            and 'fork' not in multiprocessing.get_all_start_methods()):
+        logger.warning(
+            'worker processes cannot be forked on this platform; massaging '
+            'names in this process instead')
+        workers = 1
+    if workers > 1:
+        preload(survivors, args.romanize)
+        state = {
+            'plan': plan,
+            'snapshot_path': snapshot.path if snapshot is not None else None,
+            'http_fallback': http_fallback,
+            'time_periods': time_periods,
+            'romanize': args.romanize,
+            'sluggify': args.sluggify,
+            'abstract': args.abstract,
+            'places_url': PLACES.places_url,
+            'client': get_client().settings(),
+            'cache': cache_settings,
+            'romanization_cache': romanizations.path,
+        }
+        items = [
+            item for i, item in enumerate(src_data) if i not in failures]
+        massaged = iter(massage_in_workers(items, state, workers))
+    else:
+        validated = validate_names(
+            survivors,
+            plan=plan,
+            snapshot=snapshot,
+            http_fallback=http_fallback)
         if args.romanize:
-            try:
-                pn.generate_romanized()
-            except ValueError as exc:
-                try:
-                    title = item['romanized']
-                except:
-                    title = item['attested']
-                logger.critical(
-                    'generate-romanized:{}: Pleiades name creation failed '
-                    'during attempted romanization '
-                    'for nameid={} ({}). Details: {}'
-                    ''.format(nameid, nameid, title, exc))
-                continue
-        if args.sluggify:
-            try:
-                pn.generate_slug()
-            except ValueError as exc:
-                try:
-                    title = item['romanized']
-                except:
-                    title = item['attested']
-                logger.critical(
-                    'generate-slug:{}: Pleiades name creation failed during '
-                    'slug generation '
-                    'for nameid={} ({}). Details: {}'
-                    ''.format(nameid, nameid, title, exc))
-                continue
-        if args.abstract:
-            pn.generate_summary()
-        arguments = dir(pn)
-        arguments = [a for a in arguments if a[0] != '_']
-        arguments = [a for a in arguments if not callable(getattr(pn, a))]
-        d = {}
-        for a in arguments:
-            d[a] = getattr(pn, a)
-        d['nameid'] = nameid
-        d = {k: v for k, v in d.items() if v != ''}
-        logger.debug(pformat(d))
-        names.append(d)
+            # romanize in bulk, one language at a time; generate_romanized()
+            # then finds the results in the romanization cache
+            romanize_batch(
+                [(pn.language, pn.attested) for pn, exc in validated
+                    if exc is None and pn.attested != ''],
+                workers=int(args.jobs))
+        items = [
+            item for i, item in enumerate(src_data) if i not in failures]
+        massaged = (
+            massage_name(
+                item, pn, exc, time_periods, args.romanize, args.sluggify,
+                args.abstract)
+            for item, (pn, exc) in zip(items, validated))
+    names = []
+    for i, item in enumerate(src_data):
+        if i in failures:
+            d, records = massage_name(
+                item, None, ValueError('; '.join(failures[i])), time_periods)
+        else:
+            d, records = next(massaged)
+        for level, msg in records:
+            logger.log(level, msg)
+        if d is not None:
+            logger.debug(pformat(d))
+            names.append(d)
+    elapsed = time.monotonic() - started
+    logger.info(
+        'massaged {} rows in {:.2f} seconds ({:.1f} rows per second)'
+        ''.format(len(rows), elapsed, len(rows) / max(elapsed, 1e-6)))
     with open(dest, 'w') as f:
         json.dump(names, f, ensure_ascii=False, sort_keys=True, indent=4)
+    logger.info('HTTP response cache: {}'.format(pformat(cache.stats())))
+    logger.info(
+        'HTTP requests coalesced: {}'.format(pformat(FLIGHTS.stats())))
+    logger.info('HTTP client: {}'.format(pformat(get_client().stats())))
+    logger.info(
+        'language detection: {}'.format(pformat(DETECTION.stats())))
+    logger.info(
+        'transliterators: {}'.format(pformat(TRANSLITERATORS.stats())))
+    logger.info(
+        'romanization cache: {}'.format(pformat(romanizations.stats())))
+    logger.info(
+        'language tags: {}'.format(pformat(RESOLVER.stats())))
+    logger.info(
+        'summary/details sanitizing: {}'.format(pformat(SANITIZER.stats())))
+    logger.info(
+        'CSV dialect cache: {}'.format(pformat(DIALECT_CACHE.stats())))
+    if args.language_lookup != '':
+        RESOLVER.save(language_lookup)
+    logger.info(
+        'place registry: {} places, {} lookups, {} fetches'
+        ''.format(len(PLACES), PLACES.lookups, PLACES.fetches))
 
 
 if __name__ == "__main__":
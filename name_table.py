@@ -0,0 +1,191 @@
+"""Triage a whole table of name rows column by column.
+
+Constructing a PleiadesName runs every check on one value at a time, through
+the attribute setters, and stops at the first failure. The class NameTable
+instead takes the columns of a names CSV file and applies each cheap local
+rule to a whole column in one pass: set membership for vocabulary terms
+(checked once per distinct term), compiled regular expressions for pids and
+slugs, the codepoint table for romanized forms, and blank masks for the
+required values. The result is an error matrix with one row per input row
+and one column per rule, so that rows which are bound to fail can be set
+aside before the expensive language and HTTP checks are run on the rest.
+
+Every rule here is one that PleiadesName itself enforces, so a row that
+passes triage may still fail later, but a row that fails triage would never
+have been accepted.
+
+"""
+from codepoints import TABLE as CODEPOINTS
+import inspect
+from language_resolver import RESOLVER
+from names import PleiadesName, RX_PID, RX_SLUG
+from normalize_space import normalize_space
+from sanitization import SANITIZER
+from unicode_normalization import normalize_batch
+from vocabulary_store import VOCABULARY
+
+# columns read from name rows
+COLUMNS = (
+    'pid',
+    'association_certainty',
+    'attested',
+    'details',
+    'language',
+    'name_type',
+    'romanized',
+    'slug',
+    'summary',
+    'transcription_accuracy',
+    'transcription_completeness',
+)
+VOCABULARY_COLUMNS = (
+    'association_certainty',
+    'name_type',
+    'transcription_accuracy',
+    'transcription_completeness',
+)
+UNICODE_COLUMNS = ('attested', 'details', 'romanized', 'summary')
+# values PleiadesName uses for columns left blank
+DEFAULTS = {
+    k: p.default
+    for k, p in inspect.signature(PleiadesName).parameters.items()
+    if k in COLUMNS and p.default is not inspect.Parameter.empty}
+# rules, in the order of the columns of the error matrix
+RULES = (
+    'pid',
+    'forms',
+    'language',
+    'unicode',
+    'romanized',
+    'slug',
+    'summary',
+) + VOCABULARY_COLUMNS
+
+
+class NameTable:
+    """Check the columns of a table of name rows against the local rules."""
+
+    def __init__(self, columns: dict, ignore_unicode_errors=False):
+        """Load a table from its columns.
+
+        Args:
+            columns: dictionary of equal-length lists of strings keyed by
+                column name (see COLUMNS); missing columns are treated as
+                blank
+            ignore_unicode_errors: if True, values whose NFC and NFKC forms
+                differ are not errors (as for PleiadesName)
+
+        Exceptions raised:
+            - ValueError: the columns are not all the same length.
+
+        """
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(
+                'NameTable columns must all be the same length, not {}.'
+                ''.format(sorted(lengths)))
+        self.length = lengths.pop() if lengths else 0
+        self.raw = {
+            k: list(columns.get(k, [''] * self.length)) for k in COLUMNS}
+        self.ignore_unicode_errors = ignore_unicode_errors
+        self.columns = {}
+        self.errors = None
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs):
+        """Load a table from row dictionaries (e.g., from read_csv).
+
+        Blank cells, or cells missing from a row, are read as ''.
+
+        """
+        rows = list(rows)
+        columns = {k: [row.get(k, '') for row in rows] for k in COLUMNS}
+        return cls(columns, **kwargs)
+
+    def _normalize(self):
+        """Normalize space in every column and Unicode in the text columns."""
+        divergent = [False] * self.length
+        for k, raw in self.raw.items():
+            column = [normalize_space(v) for v in raw]
+            if k in UNICODE_COLUMNS:
+                column, divergences = normalize_batch(column)
+                for d in divergences:
+                    divergent[d.index] = True
+            if k in DEFAULTS:
+                column = [v if v != '' else DEFAULTS[k] for v in column]
+            self.columns[k] = column
+        return divergent
+
+    def validate(self):
+        """Apply every rule to every row.
+
+        Returns:
+            The error matrix (see matrix()).
+
+        """
+        self.errors = {}
+        divergent = self._normalize()
+        c = self.columns
+        self.errors['pid'] = [
+            None if RX_PID.match(v) else 'malformed pid "{}"'.format(v)
+            for v in c['pid']]
+        self.errors['forms'] = [
+            'both attested and romanized are blank'
+            if a == '' and r == '' else None
+            for a, r in zip(c['attested'], c['romanized'])]
+        valid = {v: v != '' and RESOLVER.check(v)
+                 for v in dict.fromkeys(c['language'])}
+        self.errors['language'] = [
+            None if valid[v] else 'invalid language tag "{}"'.format(v)
+            for v in c['language']]
+        if self.ignore_unicode_errors:
+            self.errors['unicode'] = [None] * self.length
+        else:
+            self.errors['unicode'] = [
+                'NFC and NFKC forms differ' if d else None
+                for d in divergent]
+        self.errors['romanized'] = [
+            None if ok else 'romanized form is not in Latin script'
+            for ok in CODEPOINTS.romanized_column(c['romanized'])]
+        self.errors['slug'] = [
+            None if v == '' or RX_SLUG.match(v)
+            else 'malformed slug "{}"'.format(v)
+            for v in c['slug']]
+        self.errors['summary'] = [
+            None if SANITIZER.to_text(v) == v else 'summary is not plain text'
+            for v in self.raw['summary']]
+        for k in VOCABULARY_COLUMNS:
+            terms = VOCABULARY.terms(k)
+            self.errors[k] = [
+                None if v in terms else 'unknown {} "{}"'.format(k, v)
+                for v in c[k]]
+        return self.matrix()
+
+    def matrix(self):
+        """Get the error matrix.
+
+        Returns:
+            A list with one list per row, holding for each rule in RULES the
+            error message, or None if the row passes that rule.
+
+        """
+        if self.errors is None:
+            self.validate()
+        return [list(row) for row in zip(*(self.errors[r] for r in RULES))]
+
+    def failures(self):
+        """Get the errors of the rows that fail any rule.
+
+        Returns:
+            A dictionary of lists of error messages keyed by row index.
+
+        """
+        failures = {}
+        for i, row in enumerate(self.matrix()):
+            messages = [m for m in row if m is not None]
+            if len(messages) > 0:
+                failures[i] = messages
+        return failures
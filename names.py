@@ -1,53 +1,40 @@
 """Construct and validate data for Pleiades name resources.
 
 Defines the class PleiadesName, whose attributes and methods constitute the
-full capabilities of this module.
+full capabilities of this module, and the helper functions sluggify() and
+language_script() it uses to make URL slugs and to find the script implied
+by a language tag.
 
 """
-import bleach
-import html2text
+from codepoints import TABLE as CODEPOINTS
+from collections import ChainMap
+from http_cache import fetch
 import inspect
-from language_tags import tags as language_tags
+from language_detection import DETECTION
+from language_resolver import RESOLVER
 import logging
-from polyglot.detect import Detector as LanguageDetector
-from polyglot.transliteration import Transliterator
+from operator import attrgetter
+from place_registry import PlaceRegistry
 from pprint import pprint
 import re
+from romanization_cache import banalize, transliterate
+from sanitization import ALLOWED_TAGS, SANITIZER
 import requests
-from requests.exceptions import ConnectionError
-import requests_cache
+from requests.exceptions import ConnectionError, Timeout
 import string
 import sys
-import unicodedata
-from unidecode import unidecode
+from unicode_normalization import normalize_unicode
 from urllib.error import URLError
-from vocabularies import VOCABULARIES, UNICODE_RANGES
-
-requests_cache.install_cache(backend='memory')
-requests_cache.clear()
+from vocabulary_store import VOCABULARY
 
 # polyglot is overly chatty with warnings; shut it up
 logging.getLogger('polyglot.detect.base').setLevel('CRITICAL')
 
 RX_PID = re.compile('^\d+$')
 RX_SLUG = re.compile('^[a-z\-\d]+$')
-RX_ROMANIZED = r''
-allowed_ranges = [
-    'basic_latin',
-    'latin_1',
-    'latin_extended_a',
-    'latin_extended_b',
-    'latin_extended_additional',
-    'ipa_extensions',
-    'spacing_modifier_letters',
-    'latin_extended_c',
-    'combining_diacritical_marks']
-for k, v in UNICODE_RANGES.items():
-    if k in allowed_ranges:
-        RX_ROMANIZED += r'{}-{}'.format(*v)
-RX_ROMANIZED = re.compile('^[{}]*$'.format(RX_ROMANIZED))
 PLEIADES_BASE_URL = 'https://pleiades.stoa.org'
 PLEIADES_PLACES_URL = '/'.join((PLEIADES_BASE_URL, 'places'))
+PLACES = PlaceRegistry(PLEIADES_PLACES_URL)
 NONZERO = [
     'pid',
     'association_certainty',
@@ -59,15 +46,69 @@ NONZERO = [
     'transcription_accuracy',
     'transcription_completeness',
 ]
+# attributes exported by PleiadesName.to_dict() and to_rows(), in order
+FIELDS = (
+    'association_certainty',
+    'attested',
+    'details',
+    'language',
+    'language_script',
+    'name_type',
+    'pid',
+    'romanized',
+    'slug',
+    'summary',
+    'time_periods',
+    'transcription_accuracy',
+    'transcription_completeness',
+)
+FIELD_GETTER = attrgetter(*FIELDS)
 NOPUNCT = str.maketrans(
     {key: None for key in string.punctuation if key != "-"})
-ALLOWED_TAGS = bleach.ALLOWED_TAGS
-ALLOWED_TAGS.extend(['p'])
+
+
+def sluggify(name: str):
+    """Make a Pleiades URL slug from a (romanized) name string."""
+    s = banalize(name)
+    s = s.lower().translate(NOPUNCT).split()
+    s = '-'.join(s).encode('ascii', 'xmlcharrefreplace')
+    return s.decode('ascii')
+
+
+def language_script(tag: str):
+    """Get the ISO 15924 code of the script implied by a language tag."""
+    return RESOLVER.script(tag)
 
 
 class PleiadesName:
     """Create, validate, and enhance data for a Pleiades name resource."""
 
+    # instances keep their values in slots rather than a dictionary, so that
+    # batches of 100,000 names stay small
+    __slots__ = (
+        '_association_certainty',
+        '_attested',
+        '_defer_validation',
+        '_details',
+        '_http_fallback',
+        '_ignore_unicode_errors',
+        '_language',
+        '_locally_valid',
+        '_name_type',
+        '_places',
+        '_pid',
+        '_responses',
+        '_romanized',
+        '_skip_http_tests',
+        '_slug',
+        '_snapshot',
+        '_summary',
+        '_time_periods',
+        '_transcription_accuracy',
+        '_transcription_completeness',
+        'validated',
+    )
+
     def __init__(
         self, pid: str, *,
         association_certainty: str = 'certain',
@@ -84,7 +125,12 @@ class PleiadesName:
         creators: str = '',
         contributors: str = '',
         skip_http_tests=False,
-        ignore_unicode_errors=False
+        ignore_unicode_errors=False,
+        snapshot=None,
+        http_fallback=True,
+        responses=None,
+        places=None,
+        defer_validation=False
     ):
         """Construct a PleiadesName object.
 
@@ -105,6 +151,26 @@ class PleiadesName:
                 transmitting this name
             transcription_completeness*: is the name as transmitted by the
                 witnesses fragmentary or complete?
+            ignore_unicode_errors: if True, a value whose NFC and NFKC forms
+                differ is only logged as a warning, not a ValueError
+            snapshot: a snapshot.PleiadesSnapshot object against which pid
+                and slug are checked locally before any HTTP test is tried
+            http_fallback: if False, a pid or slug that is not found in the
+                snapshot is not checked via HTTP (so a slug created in
+                Pleiades after the snapshot was built is not caught); new
+                slugs are nearly always missing from the snapshot, so with
+                True a snapshot saves few slug requests
+            responses: a dictionary of already-fetched requests.Response
+                objects keyed by URL (see prefetch.check_urls) that is
+                consulted before any HTTP request is made
+            places: a place_registry.PlaceRegistry object through which the
+                parent place is looked up (default: the module-level PLACES
+                registry shared by all names in a run); slug URLs are built
+                from its places_url as well
+            defer_validation: if True, attribute values are only normalized
+                and stored, here and on later assignment; call validate()
+                (or validation.validate_deferred() for many names at once)
+                to run the checks
 
         * values for attributes marked with an asterisk above must be
           drawn from an appropriate Pleiades project vocabulary. These
@@ -113,10 +179,23 @@ class PleiadesName:
         Exceptions raised:
             - TypeError: omission of required attributes or use of unexpected
               object types for attribute values.
-            - ValueError: use of invalid values for attributes.
+            - ValueError: use of invalid values for attributes (unless
+              defer_validation is True).
 
         """
+        self._defer_validation = defer_validation
+        self.validated = not defer_validation
+        self._locally_valid = not defer_validation
         self._skip_http_tests = skip_http_tests
+        self._ignore_unicode_errors = ignore_unicode_errors
+        self._snapshot = snapshot
+        self._http_fallback = http_fallback
+        if responses is None:
+            responses = {}
+        self._responses = responses
+        if places is None:
+            places = PLACES
+        self._places = places
         self.pid = pid
         self.language = language
         self.attested = attested
@@ -129,10 +208,8 @@ class PleiadesName:
         self.time_periods = time_periods
         self.transcription_accuracy = transcription_accuracy
         self.transcription_completeness = transcription_completeness
-        if attested == '' and romanized == '':
-            raise ValueError(
-                'A Pleiades name cannot be created if both the '
-                '"attested" and "romanized" fields are blank.')
+        if not self._defer_validation:
+            self.__check_forms()
 
     # attribute: pid (ID of Pleiades place that will be parent of this name)
     @property
@@ -153,34 +230,11 @@ class PleiadesName:
               digits.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._pid = w
-        m = RX_PID.match(w)
-        if not m:
-            raise ValueError(
-                'Pleiades IDs (pids) must be strings of Arabic '
-                'numeral digits. "{}" does not meet this requirement.'
-                ''.format(w))
-        elif self._skip_http_tests:
-            logger_name = ':'.join(
-                (__name__, inspect.currentframe().f_code.co_name))
-            logger = logging.getLogger(logger_name)
-            logger.warning(
-                'Skipping HTTP test on pid="{}".'
-                ''.format(w))
-        else:
-            p_url = '/'.join((PLEIADES_PLACES_URL, w, 'json'))
-            try:
-                success = self.__fetch('pid', p_url)
-            except:
-                raise
-            else:
-                if not success:
-                    raise ValueError(
-                        'Pleiades pid "{}" does not seem to have a '
-                        'corresponding place resource in Pleiades; therefore '
-                        'it cannot be the parent pid of a name resource.'
-                        ''.format(w))
+        if not self._defer_validation:
+            self.__check_pid(w)
+            self.__check_pid_exists(w)
 
     # attribute: association_certainty
     @property
@@ -201,9 +255,10 @@ class PleiadesName:
               invalid.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._association_certainty = w
-        self.__valid_against_vocab('association_certainty', w)
+        if not self._defer_validation:
+            self.__valid_against_vocab('association_certainty', w)
 
     # attribute: attested
     @property
@@ -240,24 +295,8 @@ class PleiadesName:
                     'Attested name form "{}" was normalized to the '
                     'Unicode canonical composition form "{}".'
                     ''.format(w, normed))
-            detector = LanguageDetector(normed)
-            languages = [l.code for l in detector.languages if l.code != 'un']
-            if detector.reliable:
-                if self.language not in languages:
-                    raise ValueError(
-                        'The provided value for the language tag ({}) '
-                        'does not match the language detected by '
-                        'polyglot for the attested name form "{}." '
-                        'Possibilities include: {}.'
-                        ''.format(self.language, w, '" or "'.join(languages)))
-            else:
-                logger_name = ':'.join(
-                    (__name__, inspect.currentframe().f_code.co_name))
-                logger = logging.getLogger(logger_name)
-                logger.info(
-                    'Skipping language verification for "{}" because polyglot '
-                    'thinks its identification ("{}") is unreliable.'
-                    ''.format(w, '" or "'.join(languages)))
+            if not self._defer_validation:
+                self.__check_attested(normed)
         else:
             self._attested = w
 
@@ -271,15 +310,10 @@ class PleiadesName:
     def details(self, v: str):
         """Set the value of the object's "details" attribute."""
         w = self.__normalize_space(self.__normalize_unicode(v))
-        x = bleach.clean(w, strip=True)
-        x = self.__normalize_space(x)
-        self._details = x
-        if x != w:
-            logger_name = ':'.join(
-                (__name__, inspect.currentframe().f_code.co_name))
-            logger = logging.getLogger(logger_name)
-            logger.info(
-                'Details was sanitized. Result: \n{}'.format(x))
+        if self._defer_validation:
+            self._details = w
+        else:
+            self._details = self.__sanitize_details(w)
 
     # attribute: language (IANA-registered language code)
     @property
@@ -299,27 +333,15 @@ class PleiadesName:
               determined by the "language_tags" module.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._language = w
-        if not language_tags.check(w):
-            raise ValueError(
-                '"{}" does not validate as an IANA language tag.'
-                ''.format(w))
+        if not self._defer_validation:
+            self.__check_language(w)
 
     # read-only attribute: language_script
     @property
     def language_script(self):
-        try:
-            # get script subtag that is explicit in the tag
-            iana_script = language_tags.tag(self.language).script.format
-        except AttributeError:
-            # there was no explicit script subtag
-            try:
-                # get default script subtag (suppress script)
-                iana_script = language_tags.language(self.language).script
-            except:
-                raise
-        return str(iana_script)
+        return language_script(self.language)
 
     # attribute: name_type
     @property
@@ -340,9 +362,10 @@ class PleiadesName:
               invalid.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._name_type = w
-        self.__valid_against_vocab('name_type', w)
+        if not self._defer_validation:
+            self.__valid_against_vocab('name_type', w)
 
     # attribute: romanized
     @property
@@ -376,14 +399,8 @@ class PleiadesName:
                     'Romanized name form "{}" was normalized to the '
                     'Unicode canonical composition form "{}".'
                     ''.format(w, normed))
-            m = RX_ROMANIZED.match(normed)
-            if not m:
-                raise ValueError(
-                    'A "romanized" Pleiades name string must only '
-                    'contain "Latin" Unicode characters and combining '
-                    'diacritics. "{}" does '
-                    'not meet this requirement.'
-                    ''.format(normed))
+            if not self._defer_validation:
+                self.__check_romanized(normed)
         else:
             self._romanized = w  # zero-length romanized form is ok
 
@@ -409,32 +426,9 @@ class PleiadesName:
         """
         w = self.__normalize_space(v)
         self._slug = w
-        if w != '':
-            m = RX_SLUG.match(w)
-            if not m:
-                raise ValueError(
-                    'Pleiades name slugs must be strings of alpha-'
-                    'numeric Roman characters. "{}" does not meet '
-                    'this requirement.'.format(w))
-            elif self._skip_http_tests:
-                logger_name = ':'.join(
-                    (__name__, inspect.currentframe().f_code.co_name))
-                logger = logging.getLogger(logger_name)
-                logger.warning(
-                    'Skipping slug validation via HTTP for "{}".'
-                    ''.format(w))
-            else:
-                p_url = '/'.join((PLEIADES_PLACES_URL, self.pid, w))
-                try:
-                    success = self.__fetch('slug', p_url)
-                except:
-                    raise
-                else:
-                    if success:
-                        raise ValueError(
-                            'The specified slug ({}) already exists in '
-                            'Pleiades ({}).'
-                            ''.format(w, p_url))
+        if not self._defer_validation:
+            self.__check_slug(w)
+            self.__check_slug_unused(w)
 
     # attribute: summary
     @property
@@ -455,17 +449,11 @@ class PleiadesName:
               plain text.
 
         """
-        h = html2text.HTML2Text()
-        h.ignore_links = True
-        h.ignore_images = True
-        h.ignore_emphasis = True
-        h.body_width = 0
-        w = h.handle(v).strip()
+        if self._defer_validation:
+            w = v
+        else:
+            w = self.__check_summary(v)
         self._summary = self.__normalize_space(self.__normalize_unicode(w))
-        if w != v:
-            raise ValueError(
-                'Value provided for summary "{}" appears not to be plain '
-                'text; rather, it appears to be HTML.')
 
     # attribute: time_periods
     @property
@@ -478,17 +466,14 @@ class PleiadesName:
         """Set the value of the object's "time_periods" attribute."""
         self._time_periods = []
         for p in periods:
-            q = self.__normalize_space(p)
+            q = sys.intern(self.__normalize_space(p))
             logger_name = ':'.join(
                     (__name__, inspect.currentframe().f_code.co_name))
             logger = logging.getLogger(logger_name)
             logger.debug('Adding time period "{}".'.format(q))
-            try:
+            if not self._defer_validation:
                 self.__valid_against_vocab('time_periods', q)
-            except ValueError:
-                raise
-            else:
-                self._time_periods.append(q)
+            self._time_periods.append(q)
 
     # attribute: transcription_accuracy
     @property
@@ -509,9 +494,10 @@ class PleiadesName:
               invalid.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._transcription_accuracy = w
-        self.__valid_against_vocab('transcription_accuracy', w)
+        if not self._defer_validation:
+            self.__valid_against_vocab('transcription_accuracy', w)
 
     # attribute: transcription_completeness
     @property
@@ -532,9 +518,10 @@ class PleiadesName:
               therefore invalid.
 
         """
-        w = self.__normalize_space(v)
+        w = sys.intern(self.__normalize_space(v))
         self._transcription_completeness = w
-        self.__valid_against_vocab('transcription_completeness', w)
+        if not self._defer_validation:
+            self.__valid_against_vocab('transcription_completeness', w)
 
     # public methods
     def complete(self):
@@ -548,6 +535,18 @@ class PleiadesName:
             return False
         return True
 
+    def to_dict(self, omit_empty: bool = True):
+        """Get the exported attributes (see FIELDS) as a dictionary.
+
+        Args:
+            omit_empty: if True, leave out attributes whose value is ''
+
+        """
+        d = dict(zip(FIELDS, FIELD_GETTER(self)))
+        if omit_empty:
+            d = {k: v for k, v in d.items() if v != ''}
+        return d
+
     def generate_romanized(self):
         """Generate a romanized form from the attested form."""
 
@@ -558,15 +557,12 @@ class PleiadesName:
         if iana_script == 'Latn':
             if self.attested not in r:
                 r.append(self.attested)
-            b = unicodedata.normalize(
-                'NFC', unidecode(
-                    unicodedata.normalize('NFKD', self.attested)))
+            b = banalize(self.attested)
             if b not in r:
                 r.append(b)
         else:
             try:
-                transliterator = Transliterator(
-                    source_lang=self.language, target_lang='en')
+                t = transliterate(self.attested, self.language)
             except URLError:
                 logger_name = ':'.join(
                     (__name__, inspect.currentframe().f_code.co_name))
@@ -581,7 +577,6 @@ class PleiadesName:
                 else:
                     logger.warning(msg)
             else:
-                t = transliterator.transliterate(self.attested)
                 t = string.capwords(t)
                 if t not in r:
                     r.append(t)
@@ -596,36 +591,35 @@ class PleiadesName:
             self.generate_romanized()
         names = [n.strip() for n in self.romanized.split(',')]
         logger.debug('names: {}'.format(names))
-        s = unicodedata.normalize(
-            'NFC', unidecode(
-                unicodedata.normalize('NFKD', names[0])))
-        s = s.lower().translate(NOPUNCT).split()
-        s = '-'.join(s).encode('ascii', 'xmlcharrefreplace')
-        self.slug = s.decode('ascii')
+        self.slug = sluggify(names[0])
 
     def generate_summary(self):
         """Generate an abstract/summary for this name resource."""
         logger_name = ':'.join(
             (__name__, inspect.currentframe().f_code.co_name))
         logger = logging.getLogger(logger_name)
-        p_url = '/'.join((PLEIADES_PLACES_URL, self.pid, 'json'))
-        place = self.__fetch('pid', p_url).json()
+        title = None
+        if self._snapshot is not None:
+            title = self._snapshot.title(self.pid)
+        if not title:
+            place = self.__place(self.pid)
+            if place:
+                title = place.get('title')
+        if not title:
+            # no place, or an empty one (e.g., after a connection error)
+            raise ValueError(
+                'Cannot generate a summary because Pleiades pid "{}" '
+                'does not seem to have a corresponding place resource '
+                'with a title.'
+                ''.format(self.pid))
         logger.debug('language tag: {}'.format(self.language))
-        lang_desc = language_tags.description(self.language)
-        if len(lang_desc) > 1 and '-' in self.language:
-            lang_desc = self.language.split('-')
-            script_desc = [l for l in lang_desc if len(l) == 4]
-            lang_desc = [l for l in lang_desc if len(l) < 4 and l.lower() == l]
-            lang_desc = language_tags.description(lang_desc[0])[0]
-            script_desc = language_tags.description(script_desc[0])[0]
+        info = RESOLVER.resolve(self.language)
+        if info.script_description != '':
             lang_chunk = (
                 '{}-language name in {} script'
-                ''.format(lang_desc, script_desc))
+                ''.format(info.language_description, info.script_description))
         else:
-            lang_desc = lang_desc[0]
-            script_desc = ''
-            lang_chunk = '{}-language name'.format(lang_desc)
-        title = place['title']
+            lang_chunk = '{}-language name'.format(info.language_description)
         if title in lang_chunk:
             title_chunk = ''
         else:
@@ -635,7 +629,202 @@ class PleiadesName:
             summary += '.'
         self.summary = summary
 
+    def validate(
+        self, local: bool = True, remote: bool = True, responses: dict = None
+    ):
+        """Run the checks skipped when constructed with defer_validation.
+
+        Cheap checks run first; language detection and the (snapshot or
+        HTTP) lookups of pid and slug come last. HTML in details is
+        sanitized and the summary is converted to plain text.
+
+        Args:
+            local: run the checks that need no lookups
+            remote: check that the parent place exists and that the slug is
+                not yet in use
+            responses: a dictionary of already-fetched requests.Response
+                objects keyed by URL to consult as well (see
+                prefetch.check_urls)
+
+        Exceptions raised:
+            - ValueError: the first invalid attribute value found.
+
+        """
+        if responses is not None:
+            self._responses = ChainMap(self._responses, responses)
+        if local:
+            self.__check_pid(self.pid)
+            self.__check_language(self.language)
+            for vocab_name in [
+                    'association_certainty', 'name_type',
+                    'transcription_accuracy', 'transcription_completeness']:
+                self.__valid_against_vocab(
+                    vocab_name, getattr(self, vocab_name))
+            for p in self.time_periods:
+                self.__valid_against_vocab('time_periods', p)
+            self.__check_romanized(self.romanized)
+            self.__check_slug(self.slug)
+            self.__check_forms()
+            self._summary = self.__normalize_space(
+                self.__check_summary(self.summary))
+            self._details = self.__sanitize_details(self.details)
+            self.__check_attested(self.attested)
+            self._locally_valid = True
+        if remote:
+            self.__check_pid_exists(self.pid)
+            self.__check_slug_unused(self.slug)
+            self.validated = self._locally_valid
+
     # internal utility methods
+    def __check_forms(self):
+        """Check that there is an attested or a romanized form."""
+        if self.attested == '' and self.romanized == '':
+            raise ValueError(
+                'A Pleiades name cannot be created if both the '
+                '"attested" and "romanized" fields are blank.')
+
+    def __check_pid(self, w: str):
+        """Check that a pid is well formed."""
+        if not RX_PID.match(w):
+            raise ValueError(
+                'Pleiades IDs (pids) must be strings of Arabic '
+                'numeral digits. "{}" does not meet this requirement.'
+                ''.format(w))
+
+    def __check_pid_exists(self, w: str):
+        """Check that a pid belongs to a place in Pleiades."""
+        msg_missing = (
+            'Pleiades pid "{}" does not seem to have a corresponding place '
+            'resource in Pleiades; therefore it cannot be the parent pid of '
+            'a name resource.'.format(w))
+        if self._snapshot is not None:
+            if self._snapshot.has_pid(w):
+                return
+            elif not self._http_fallback:
+                raise ValueError(msg_missing)
+        if self._skip_http_tests:
+            logger_name = ':'.join(
+                (__name__, inspect.currentframe().f_code.co_name))
+            logger = logging.getLogger(logger_name)
+            logger.warning(
+                'Skipping HTTP test on pid="{}".'
+                ''.format(w))
+        else:
+            try:
+                place = self.__place(w)
+            except:
+                raise
+            else:
+                if place is None:
+                    raise ValueError(msg_missing)
+
+    def __check_attested(self, w: str):
+        """Check the language of an attested form against self.language."""
+        if w != '':
+            try:
+                script = self.language_script
+            except AttributeError:
+                script = None
+            if DETECTION.prescreen(w, script):
+                return
+            detection = DETECTION.detect(w)
+            languages = detection.languages
+            if detection.reliable:
+                if self.language not in languages:
+                    raise ValueError(
+                        'The provided value for the language tag ({}) '
+                        'does not match the language detected by '
+                        'polyglot for the attested name form "{}." '
+                        'Possibilities include: {}.'
+                        ''.format(self.language, w, '" or "'.join(languages)))
+            else:
+                logger_name = ':'.join(
+                    (__name__, inspect.currentframe().f_code.co_name))
+                logger = logging.getLogger(logger_name)
+                logger.info(
+                    'Skipping language verification for "{}" because polyglot '
+                    'thinks its identification ("{}") is unreliable.'
+                    ''.format(w, '" or "'.join(languages)))
+
+    def __sanitize_details(self, w: str):
+        """Strip disallowed HTML from details."""
+        x = SANITIZER.clean(w)
+        x = self.__normalize_space(x)
+        if x != w:
+            logger_name = ':'.join(
+                (__name__, inspect.currentframe().f_code.co_name))
+            logger = logging.getLogger(logger_name)
+            logger.info(
+                'Details was sanitized. Result: \n{}'.format(x))
+        return x
+
+    def __check_language(self, w: str):
+        """Check that a language tag is registered with IANA."""
+        if not RESOLVER.check(w):
+            raise ValueError(
+                '"{}" does not validate as an IANA language tag.'
+                ''.format(w))
+
+    def __check_romanized(self, normed: str):
+        """Check that a romanized form uses only Latin characters."""
+        if normed != '':
+            if not CODEPOINTS.is_romanized(normed):
+                raise ValueError(
+                    'A "romanized" Pleiades name string must only '
+                    'contain "Latin" Unicode characters and combining '
+                    'diacritics. "{}" does '
+                    'not meet this requirement.'
+                    ''.format(normed))
+
+    def __check_slug(self, w: str):
+        """Check that a slug is well formed."""
+        if w != '':
+            m = RX_SLUG.match(w)
+            if not m:
+                raise ValueError(
+                    'Pleiades name slugs must be strings of alpha-'
+                    'numeric Roman characters. "{}" does not meet '
+                    'this requirement.'.format(w))
+
+    def __check_slug_unused(self, w: str):
+        """Check that a slug is not yet in use within the parent place."""
+        if w != '':
+            if self._snapshot is not None:
+                if self._snapshot.has_slug(self.pid, w):
+                    raise ValueError(
+                        'The specified slug ({}) already exists in Pleiades '
+                        '(snapshot: {}).'.format(w, self._snapshot.path))
+                elif not self._http_fallback:
+                    return
+            if self._skip_http_tests:
+                logger_name = ':'.join(
+                    (__name__, inspect.currentframe().f_code.co_name))
+                logger = logging.getLogger(logger_name)
+                logger.warning(
+                    'Skipping slug validation via HTTP for "{}".'
+                    ''.format(w))
+            else:
+                p_url = '/'.join((self._places.places_url, self.pid, w))
+                try:
+                    success = self.__fetch('slug', p_url)
+                except:
+                    raise
+                else:
+                    if success:
+                        raise ValueError(
+                            'The specified slug ({}) already exists in '
+                            'Pleiades ({}).'
+                            ''.format(w, p_url))
+
+    def __check_summary(self, v: str):
+        """Check that a summary is plain text; return it as such."""
+        w = SANITIZER.to_text(v)
+        if w != v:
+            raise ValueError(
+                'Value provided for summary "{}" appears not to be plain '
+                'text; rather, it appears to be HTML.')
+        return w
+
     def __fetch(self, name: str, url: str):
         """Fetch an item from the web and handle associated errors.
 
@@ -648,30 +837,55 @@ class PleiadesName:
                   but self.ignore_http_tests == True
             False:
 
+        """
+        r = self._responses.get(url)
+        if r is None:
+            try:
+                r = fetch(url)
+            except (ConnectionError, Timeout):
+                self.__log_connection_error(name, url)
+                if not self._skip_http_tests:
+                    raise
+                return True
+        if r.status_code == requests.codes.ok:
+            return r
+        else:
+            return False
+
+    def __log_connection_error(self, name: str, url: str):
+        """Log a web connection error as an error or, if ignored, a warning."""
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        if not self._skip_http_tests:
+            logger.error(
+                'Encountered a web connection error trying to fetch URL '
+                '({}) for "{}".'.format(url, name))
+        else:
+            logger.warning(
+                'Ignored connection error while attempting to fetch '
+                'URL ({}) for "{}".'
+                ''.format(url, name))
+
+    def __place(self, pid: str):
+        """Get the parsed JSON for a place from the place registry.
+
+        Args:
+            pid: Pleiades ID of the place
+
+        Returns:
+            dict: the parsed place JSON; an empty dictionary if a connection
+                error occurs but self._skip_http_tests == True
+            None: if there is no such place
+
         """
         try:
-            r = requests.get(url)
-        except ConnectionError:
-            logger_name = ':'.join(
-                (__name__, inspect.currentframe().f_code.co_name))
-            logger = logging.getLogger(logger_name)
+            return self._places.get(pid)
+        except (ConnectionError, Timeout):
+            self.__log_connection_error('pid', self._places.url(pid))
             if not self._skip_http_tests:
-                logger.error(
-                    'Encountered a web connection error trying to fetch URL '
-                    '({}) for "{}".'.format(url, name))
                 raise
-            else:
-                logger = logging.getLogger(logger_name)
-                logger.warning(
-                    'Ignored connection error while attempting to fetch '
-                    'URL ({}) for "{}".'
-                    ''.format(url, name))
-                return True
-        else:
-            if r.status_code == requests.codes.ok:
-                return r
-            else:
-                return False
+            return {}
 
     def __normalize_space(self, v: str):
         """Normalize space."""
@@ -679,15 +893,17 @@ class PleiadesName:
 
     def __normalize_unicode(self, v: str):
         """Normalize Unicode."""
-        canonical = unicodedata.normalize('NFC', v)
-        compatibility = unicodedata.normalize('NFKC', v)
+        canonical, compatibility = normalize_unicode(v)
         if canonical != compatibility:
             msg = (
                 'Unicode normalization may have changed the string "{}" in '
                 'an undesireable way. The canonical composition form (NFC: '
                 '"{}") does not match the compatibility composition form ('
-                'NFKC: "{}"). NFC is being used.')
-            if self.ignore_unicode_errors:
+                'NFKC: "{}"). NFC is being used.'
+                ''.format(v, canonical, compatibility))
+            if self._ignore_unicode_errors:
+                logger_name = ':'.join(
+                    (__name__, inspect.currentframe().f_code.co_name))
                 logger = logging.getLogger(logger_name)
                 logger.warning(msg)
             else:
@@ -698,24 +914,31 @@ class PleiadesName:
         """Validate a vocabulary term.
 
         Args:
-            vocab: Name of the vocabulary against which to validate. Must be
-                   a key in the VOCABULARIES dictionary imported from the
-                   vocabularies module.
-            term: Vocabulary term to validate. Must be a key within the
-                  vocabulary dictionary returned by VOCABULARIES[vocab].
+            vocab: Name of the vocabulary against which to validate (see
+                   vocabulary_store.VOCABULARY).
+            term: Vocabulary term to validate.
 
         Returns:
             True if the term is valid for the requested vocabulary. Raises
             ValueError if not.
 
         """
-        vocab = VOCABULARIES[vocab_name]
-        if term in vocab.keys():
-            return True
-        else:
-            raise ValueError(
-                'PleiadesName attribute "{}" must be a string '
-                'containing a value from the list: "{}." '
-                'The provided value ("{}") does not meet this '
-                'requirement.'
-                ''.format(vocab_name, '", "'.join(vocab.keys()), term))
+        return VOCABULARY.check(vocab_name, term)
+
+
+def to_rows(names, fields=FIELDS):
+    """Get the values of the given attributes of many names as tuples.
+
+    Args:
+        names: iterable of PleiadesName objects
+        fields: sequence of attribute names (default: FIELDS)
+
+    Returns:
+        A list with one tuple of values per name, in the order of fields.
+
+    """
+    if len(fields) == 1:
+        getter = attrgetter(fields[0])
+        return [(getter(pn),) for pn in names]
+    getter = attrgetter(*fields)
+    return [getter(pn) for pn in names]
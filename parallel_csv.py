@@ -0,0 +1,213 @@
+"""Parse large CSV files in parallel, in chunks.
+
+The function read_csv_parallel() reads the same rows as csv_utilities.
+read_csv(), but splits the file into byte ranges that each hold whole
+records, parses the ranges in a pool of worker processes, and reassembles
+the rows in file order. A range ends at a newline only where the number of
+quote characters before it is even, i.e., outside any quoted field, so
+fields with embedded newlines are never cut. Workers read their own ranges
+from the file (which the main process only maps into memory to find the
+ranges), so only the parsed rows cross process boundaries.
+
+Splitting on bytes requires an encoding in which newlines and quote
+characters are single bytes that never occur inside other characters (e.g.,
+UTF-8, Latin-1, ASCII), and a dialect that escapes quotes by doubling them
+(or does not quote at all).
+
+A stray quote character inside an unquoted field throws the count off for
+the rest of the file, and ranges may then be cut inside records. Every
+chunk therefore checks that it does not end inside a quoted field and that
+each of its records has as many fields as the header row, and if any chunk
+fails, the whole file is read again with read_csv() (so files with ragged
+rows are always read serially).
+
+"""
+import codecs
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from csv_utilities import clean_row, DIALECT_ATTRIBUTES, dialect_key
+from csv_utilities import read_csv
+import inspect
+import io
+import logging
+import mmap
+import os
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # bytes
+MIN_PARALLEL_SIZE = 2 * DEFAULT_CHUNK_SIZE  # smaller files: read_csv
+
+
+def dialect_params(dialect):
+    """Get the formatting parameters of a dialect (or its name) as a dict."""
+    return dict(zip(DIALECT_ATTRIBUTES, dialect_key(dialect)))
+
+
+def check_splittable(params: dict, encoding: str):
+    """Check that a file can be split on bytes (see the module docstring).
+
+    A byte order mark (as in "utf-8-sig") only begins the file, so it is
+    ignored.
+
+    Exceptions raised:
+        - ValueError: it cannot.
+
+    """
+    if codecs.lookup(encoding).name == 'utf-8-sig':
+        encoding = 'utf-8'
+    for c in ('\n', params['quotechar'] or '"'):
+        if codecs.encode(c, encoding) != c.encode('ascii'):
+            raise ValueError(
+                'CSV files in encoding "{}" cannot be split into chunks.'
+                ''.format(encoding))
+    if params['quoting'] != csv.QUOTE_NONE and not params['doublequote']:
+        raise ValueError(
+            'CSV files whose dialect does not double quote characters '
+            'cannot be split into chunks.')
+
+
+def record_boundaries(data, quotechar, chunk_size: int, start: int = 0):
+    """Get offsets at which data can be split between records.
+
+    Args:
+        data: CSV content as bytes or an mmap
+        quotechar: quote character as bytes, or None if quotes are not
+            special
+        chunk_size: approximate number of bytes between boundaries
+        start: offset of the first record
+
+    Returns:
+        A list of offsets beginning with start and ending with len(data).
+
+    """
+    boundaries = [start]
+    quotes = 0  # quote characters between start and pos
+    pos = start
+    while True:
+        target = boundaries[-1] + chunk_size
+        if target >= len(data):
+            break
+        while True:
+            nl = data.find(b'\n', target)
+            if nl == -1:
+                nl = len(data)
+                break
+            if quotechar is not None:
+                quotes += data[pos:nl].count(quotechar)
+                pos = nl
+            if quotes % 2 == 0:
+                break
+            target = nl + 1
+        if nl + 1 >= len(data):
+            break
+        boundaries.append(nl + 1)
+    boundaries.append(len(data))
+    return boundaries
+
+
+def parse_chunk(
+    fname: str, start: int, end: int, field_names: list, params: dict,
+    encoding: str
+):
+    """Read and parse the records in one byte range of a CSV file.
+
+    Returns:
+        A tuple (rows, aligned): a list of cleaned row dictionaries (see
+        csv_utilities.clean_row), and False if the range ends inside a
+        quoted field or any record has more or fewer fields than
+        field_names (i.e., the range was probably cut inside a record),
+        otherwise True.
+
+    """
+    with open(fname, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = io.StringIO(data.decode(encoding), newline=None)
+    # strict: raise csv.Error, rather than end the field, at the end of a
+    # range cut inside a quoted field
+    reader = csv.reader(text, strict=True, **params)
+    width = len(field_names)
+    rows = []
+    try:
+        for values in reader:
+            if len(values) == 0:
+                continue  # blank line, as DictReader skips
+            if len(values) != width:
+                return (rows, False)
+            rows.append(clean_row(dict(zip(field_names, values))))
+    except csv.Error:
+        return (rows, False)
+    return (rows, True)
+
+
+def read_csv_parallel(
+    fname: str, dialect, encoding='utf-8', workers: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE, min_size: int = MIN_PARALLEL_SIZE
+):
+    """Read a CSV file as read_csv does, parsing chunks in parallel.
+
+    Args:
+        fname: filepath of the CSV file
+        dialect: name of a registered dialect (or a dialect)
+        encoding: character encoding of the file
+        workers: number of worker processes (default: one per CPU)
+        chunk_size: approximate size of a chunk, in bytes
+        min_size: files smaller than this (in bytes) are read with
+            read_csv, as they are when there is only one worker
+
+    Returns:
+        A tuple (rows, field_names), as for read_csv.
+
+    If any chunk is misaligned (see parse_chunk), the file is read with
+    read_csv instead.
+
+    Exceptions raised:
+        - ValueError: the file cannot be split (see check_splittable).
+
+    """
+    logger_name = ':'.join(
+        (__name__, inspect.currentframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or os.path.getsize(fname) < min_size:
+        return read_csv(fname, dialect, encoding)
+    params = dialect_params(dialect)
+    check_splittable(params, encoding)
+    if params['quoting'] == csv.QUOTE_NONE:
+        quotechar = None
+    else:
+        quotechar = params['quotechar'].encode('ascii')
+    with open(fname, 'rb') as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # the header is the first record (it may have quoted newlines, too)
+        header_end = record_boundaries(data, quotechar, 1)[1]
+        field_names = next(csv.reader(
+            io.StringIO(codecs.decode(data[:header_end], encoding)),
+            **params))
+        boundaries = record_boundaries(
+            data, quotechar, chunk_size, start=header_end)
+    if codecs.lookup(encoding).name == 'utf-8-sig':
+        chunk_encoding = 'utf-8'  # chunks after the header have no BOM
+    else:
+        chunk_encoding = encoding
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                parse_chunk, fname, start, end, field_names, params,
+                chunk_encoding)
+            for start, end in ranges]
+        for (start, end), future in zip(ranges, futures):
+            chunk_rows, aligned = future.result()
+            if not aligned:
+                logger.warning(
+                    'CSV file {} has a record with the wrong number of '
+                    'fields in bytes {}-{} (a stray quote character?); '
+                    'reading it serially'.format(fname, start, end))
+                return read_csv(fname, dialect, encoding)
+            rows.extend(chunk_rows)
+    logger.info(
+        'read {} rows of data from CSV file {} in {} chunks'
+        ''.format(len(rows), fname, len(ranges)))
+    return (rows, field_names)
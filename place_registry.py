@@ -0,0 +1,96 @@
+"""Per-run registry of Pleiades place metadata.
+
+Defines the class PlaceRegistry, which keeps the parsed JSON of every
+Pleiades place looked up during a run, keyed by pid, so that pid validation,
+summary generation, and any other consumer share a single fetch and parse
+per place no matter how many names point at it, even when they look it up
+at the same time.
+
+"""
+from http_cache import fetch
+import requests
+from singleflight import SingleFlight
+import threading
+
+
+class PlaceRegistry:
+    """Keep parsed Pleiades place JSON, keyed by pid."""
+
+    def __init__(self, places_url: str):
+        """Create an empty registry.
+
+        Args:
+            places_url: base URL of Pleiades places; the JSON for a place is
+                found at <places_url>/<pid>/json
+
+        """
+        self.places_url = places_url
+        self.fetches = 0
+        self.lookups = 0
+        self._places = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def __contains__(self, pid: str):
+        return pid in self._places
+
+    def __len__(self):
+        return len(self._places)
+
+    def url(self, pid: str):
+        """Get the URL of the JSON for a place."""
+        return '/'.join((self.places_url, pid, 'json'))
+
+    def add(self, pid: str, response):
+        """Register a place from an HTTP response for its JSON.
+
+        Args:
+            pid: Pleiades ID of the place
+            response: requests.Response (or compatible) object
+
+        Returns:
+            The parsed place JSON (dict), or None if the response shows there
+            is no such place. Responses with other error statuses are not
+            registered, so the place will be fetched again if asked for.
+
+        """
+        if response.status_code == requests.codes.ok:
+            place = response.json()
+        else:
+            place = None
+            if response.status_code != requests.codes.not_found:
+                return place
+        with self._lock:
+            self._places[pid] = place
+        return place
+
+    def get(self, pid: str):
+        """Get the parsed JSON for a place, fetching it if need be.
+
+        Returns:
+            The parsed place JSON (dict), or None if there is no such place.
+
+        Exceptions raised:
+            - requests.exceptions.ConnectionError or Timeout: the place is
+              not yet registered and could not be fetched.
+
+        """
+        self.lookups += 1
+        try:
+            return self._places[pid]
+        except KeyError:
+            pass
+        return self._flights.do(pid, self._fetch, pid)
+
+    def _fetch(self, pid: str):
+        try:
+            return self._places[pid]  # registered while waiting to fetch
+        except KeyError:
+            pass
+        self.fetches += 1
+        return self.add(pid, fetch(self.url(pid)))
+
+    def clear(self):
+        """Forget all registered places."""
+        with self._lock:
+            self._places = {}
@@ -0,0 +1,265 @@
+"""Shared, rate-aware HTTP client for Pleiades lookups.
+
+Defines the class PleiadesClient, through which every request this package
+makes to Pleiades (or any other web site) should go, and the class
+AdaptiveLimiter it uses to decide how many requests may be in flight at
+once. The client provides:
+
+ - keep-alive connection pooling (one requests.Session per client)
+ - a timeout on every attempt and an overall deadline per request
+ - retries with exponential backoff on connection errors, timeouts, 429, and
+   5xx responses (honoring numeric Retry-After headers)
+ - additive-increase/multiplicative-decrease (AIMD) concurrency: the limit
+   grows while responses are quick and healthy and is cut on 429s, 5xxs,
+   timeouts, and slow responses
+ - conditional requests (If-None-Match/If-Modified-Since) for revalidating
+   cached responses (see http_cache.py)
+
+The client only knows about URLs, so it can be pointed at a local stand-in
+server for tests and benchmarks.
+
+"""
+import inspect
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+import threading
+import time
+
+DEFAULT_TIMEOUT = (5, 30)  # seconds: (connect, read) per attempt
+DEFAULT_DEADLINE = 120  # seconds: all attempts at one request
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds, doubled after each failed attempt
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONCURRENCY = 8  # initial in-flight request limit
+DEFAULT_LATENCY_TARGET = 5  # seconds; slower responses count as congestion
+RETRY_STATUSES = [
+    requests.codes.too_many_requests,
+    requests.codes.internal_server_error,
+    requests.codes.bad_gateway,
+    requests.codes.service_unavailable,
+    requests.codes.gateway_timeout,
+]
+USER_AGENT = 'pleiades-batching (+https://github.com/isawnyu/pleiades-batching)'
+
+
+class AdaptiveLimiter:
+    """Limit concurrent requests, adapting the limit by AIMD."""
+
+    def __init__(
+        self,
+        initial: float = DEFAULT_CONCURRENCY,
+        minimum: float = 1,
+        maximum: float = DEFAULT_POOL_SIZE,
+        decrease: float = 0.5,
+        latency_target: float = DEFAULT_LATENCY_TARGET
+    ):
+        """Create a limiter.
+
+        Args:
+            initial: starting number of requests allowed in flight
+            minimum, maximum: bounds on the limit
+            decrease: factor by which the limit is multiplied on congestion
+            latency_target: successful responses slower than this many
+                seconds are treated as congestion (None: never)
+
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait until another request may be started."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """Mark a request as finished."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def success(self, latency: float):
+        """Record a healthy response; grow the limit by about one per round.
+
+        Args:
+            latency: seconds the request took
+
+        """
+        if self.latency_target is not None and latency > self.latency_target:
+            self.congestion()
+            return
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.increases += 1
+            self._cond.notify_all()
+
+    def congestion(self):
+        """Record a sign of overload (429, 5xx, timeout); cut the limit."""
+        with self._cond:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.decreases += 1
+
+
+class PleiadesClient:
+    """Make pooled, deadline-bound, retried, rate-adaptive HTTP requests."""
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        deadline: float = DEFAULT_DEADLINE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        limiter: AdaptiveLimiter = None
+    ):
+        """Create a client.
+
+        Args:
+            timeout: seconds to wait for each attempt, as for requests
+                (a number, or a (connect, read) tuple)
+            deadline: seconds after which no further attempt is started
+            retries: number of attempts after the first
+            backoff: seconds to wait before the first retry; doubled after
+                each one
+            pool_size: number of keep-alive connections kept per host
+            limiter: AdaptiveLimiter governing concurrency (default: a new
+                one with at most pool_size requests in flight)
+
+        """
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        if limiter is None:
+            limiter = AdaptiveLimiter(maximum=pool_size)
+        self.limiter = limiter
+        self.requests = 0
+        self.attempts = 0
+        self.not_modified = 0
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, etag: str = None, last_modified: str = None):
+        """GET a URL.
+
+        Args:
+            url: URL to fetch
+            etag: ETag of a cached copy; sent as If-None-Match
+            last_modified: Last-Modified date of a cached copy; sent as
+                If-Modified-Since
+
+        Returns:
+            A requests.Response object. If etag or last_modified was given
+            and the resource is unchanged, its status code is 304.
+
+        Exceptions raised:
+            - requests.exceptions.ConnectionError or Timeout: every attempt
+              failed to get a response.
+
+        """
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        headers = {}
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        self.requests += 1
+        give_up = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            wait = self.backoff * 2 ** attempt
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                self.attempts += 1
+                r = self.session.get(
+                    url, headers=headers, timeout=self.timeout)
+            except (ConnectionError, Timeout) as exc:
+                self.limiter.congestion()
+                error = exc
+                r = None
+            else:
+                if r.status_code in RETRY_STATUSES:
+                    self.limiter.congestion()
+                    try:
+                        wait = max(wait, float(r.headers['Retry-After']))
+                    except (KeyError, ValueError):
+                        pass
+                else:
+                    self.limiter.success(time.monotonic() - started)
+                    if r.status_code == requests.codes.not_modified:
+                        self.not_modified += 1
+                    return r
+            finally:
+                self.limiter.release()
+            attempt += 1
+            if attempt > self.retries or time.monotonic() + wait > give_up:
+                if r is None:
+                    raise error
+                return r
+            logger.debug(
+                'attempt {} at {} failed ({}); retrying in {} seconds'
+                ''.format(
+                    attempt, url, error if r is None else r.status_code,
+                    wait))
+            time.sleep(wait)
+
+    def settings(self):
+        """Get the keyword arguments that would create a client like this.
+
+        The limiter is left out: a client made from these settings starts
+        with a new one.
+
+        """
+        return {
+            'timeout': self.timeout,
+            'deadline': self.deadline,
+            'retries': self.retries,
+            'backoff': self.backoff,
+            'pool_size': self.pool_size,
+        }
+
+    def stats(self):
+        """Get a dictionary of client counters."""
+        return {
+            'requests': self.requests,
+            'attempts': self.attempts,
+            'not_modified': self.not_modified,
+            'concurrency_limit': round(self.limiter.limit, 2),
+            'limit_increases': self.limiter.increases,
+            'limit_decreases': self.limiter.decreases,
+        }
+
+
+CLIENT = None
+
+
+def install_client(**kwargs):
+    """Create the shared client (see PleiadesClient)."""
+    global CLIENT
+    CLIENT = PleiadesClient(**kwargs)
+    return CLIENT
+
+
+def get_client():
+    """Get the shared client, creating a default one if need be."""
+    if CLIENT is None:
+        install_client()
+    return CLIENT
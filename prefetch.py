@@ -0,0 +1,228 @@
+"""Plan and run the HTTP requests a batch of Pleiades names will need.
+
+Validating and augmenting names one row at a time discovers each URL only
+when it is needed, so rows that share a parent place fetch it over and over.
+The class PrefetchPlan instead scans a whole batch first, collects the unique
+parent place URLs and candidate slug URLs (including the slugs that
+PleiadesName.generate_slug() is expected to produce), fetches them all at
+once, and reports how many requests that took compared with the naive
+row-by-row count.
+
+"""
+from codepoints import TABLE as CODEPOINTS
+from concurrent.futures import ThreadPoolExecutor
+from http_cache import fetch
+import inspect
+import logging
+from names import PLACES, PLEIADES_PLACES_URL, RX_PID, RX_SLUG
+from names import sluggify
+from normalize_space import normalize_space
+from requests.exceptions import RequestException
+
+DEFAULT_CONCURRENCY = 8
+
+
+def name_urls(
+    row: dict, snapshot=None, http_fallback=True, skip_http_tests=False,
+    places=None
+):
+    """List the URLs a PleiadesName constructed from row would fetch.
+
+    Args:
+        row: keyword arguments for PleiadesName
+        snapshot, http_fallback, skip_http_tests, places: as for PleiadesName
+
+    Returns:
+        A list of zero, one, or two URLs (parent place JSON and slug).
+
+    """
+    urls = []
+    if skip_http_tests:
+        return urls
+    if places is None:
+        places = PLACES
+    pid = normalize_space(row.get('pid', ''))
+    if not RX_PID.match(pid):
+        return urls
+    if snapshot is None or (not snapshot.has_pid(pid) and http_fallback):
+        if pid not in places:
+            urls.append(places.url(pid))
+    url = slug_url(
+        pid, normalize_space(row.get('slug', '')), snapshot, http_fallback,
+        places.places_url)
+    if url is not None:
+        urls.append(url)
+    return urls
+
+
+def slug_url(
+    pid: str, slug: str, snapshot=None, http_fallback=True,
+    places_url=PLEIADES_PLACES_URL
+):
+    """Get the URL PleiadesName would fetch to check slug, if any."""
+    if slug != '' and RX_SLUG.match(slug):
+        if snapshot is None or (
+                not snapshot.has_slug(pid, slug) and http_fallback):
+            return '/'.join((places_url, pid, slug))
+    return None
+
+
+def candidate_slug(row: dict):
+    """Guess the slug PleiadesName.generate_slug() will make for row.
+
+    Returns:
+        A slug string, or '' if there is no romanized form and the attested
+        form is not in Latin script (i.e., transliteration would be needed).
+
+    """
+    romanized = normalize_space(row.get('romanized', ''))
+    if romanized != '':
+        return sluggify(romanized.split(',')[0].strip())
+    attested = normalize_space(row.get('attested', ''))
+    if attested != '' and CODEPOINTS.is_romanized(attested):
+        return sluggify(attested)
+    return ''
+
+
+def check_urls(urls, concurrency=DEFAULT_CONCURRENCY):
+    """Fetch URLs concurrently.
+
+    Args:
+        urls: iterable of URLs; duplicates are fetched only once
+        concurrency: maximum number of worker threads; the shared
+            pleiades_client.PleiadesClient may allow fewer requests in
+            flight if the server shows signs of overload
+
+    Returns:
+        A dictionary of requests.Response objects keyed by URL. URLs that
+        could not be fetched at all (e.g., connection errors) are left out,
+        so that PleiadesName will try them again and handle the error itself.
+
+    """
+    logger_name = ':'.join(
+        (__name__, inspect.currentframe().f_code.co_name))
+    logger = logging.getLogger(logger_name)
+    unique = list(dict.fromkeys(urls))
+    responses = {}
+
+    def fetch_one(url):
+        try:
+            return url, fetch(url)
+        except RequestException as exc:
+            logger.debug('Fetch of {} failed: {}'.format(url, exc))
+            return url, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for url, r in executor.map(fetch_one, unique):
+            if r is not None:
+                responses[url] = r
+    logger.info(
+        'fetched {} of {} unique URLs with concurrency {}'
+        ''.format(len(responses), len(unique), concurrency))
+    return responses
+
+
+class PrefetchPlan:
+    """Collect, de-duplicate, and fetch the URLs needed by a batch of names."""
+
+    def __init__(
+        self, *,
+        snapshot=None,
+        http_fallback: bool = True,
+        skip_http_tests: bool = False,
+        places=None,
+        generate_slugs: bool = False,
+        generate_summaries: bool = False
+    ):
+        """Create an empty plan.
+
+        Args:
+            snapshot, http_fallback, skip_http_tests, places: as for
+                PleiadesName
+            generate_slugs: slugs will be generated
+                (PleiadesName.generate_slug)
+            generate_summaries: summaries will be generated
+                (PleiadesName.generate_summary)
+
+        """
+        self.snapshot = snapshot
+        self.http_fallback = http_fallback
+        self.skip_http_tests = skip_http_tests
+        if places is None:
+            places = PLACES
+        self.places = places
+        self.generate_slugs = generate_slugs
+        self.generate_summaries = generate_summaries
+        self.rows = 0
+        self.naive = 0
+        self.responses = None
+        self._urls = {}  # URL: pid (for parent place URLs) or None
+
+    @property
+    def urls(self):
+        """Get the list of unique URLs in the plan."""
+        return list(self._urls.keys())
+
+    def add(self, row: dict):
+        """Add the URLs needed by one row (PleiadesName keyword arguments)."""
+        self.rows += 1
+        if self.skip_http_tests:
+            return
+        pid = normalize_space(row.get('pid', ''))
+        if not RX_PID.match(pid):
+            return
+        # row-by-row processing fetches the parent place (again for a
+        # summary) and each slug set or generated
+        self.naive += 1
+        if normalize_space(row.get('slug', '')) != '':
+            self.naive += 1
+        if self.generate_summaries:
+            self.naive += 1
+        urls = name_urls(
+            row,
+            snapshot=self.snapshot,
+            http_fallback=self.http_fallback,
+            places=self.places)
+        if self.generate_slugs:
+            self.naive += 1
+            url = slug_url(
+                pid, candidate_slug(row), self.snapshot, self.http_fallback,
+                self.places.places_url)
+            if url is not None:
+                urls.append(url)
+        pid_url = self.places.url(pid)
+        for url in urls:
+            if url == pid_url:
+                self._urls[url] = pid
+            else:
+                self._urls.setdefault(url, None)
+
+    def extend(self, rows):
+        """Add the URLs needed by each of a sequence of rows."""
+        for row in rows:
+            self.add(row)
+
+    def execute(self, concurrency: int = DEFAULT_CONCURRENCY):
+        """Fetch all the URLs in the plan and register the parent places.
+
+        Returns:
+            A dictionary of responses keyed by URL (see check_urls).
+
+        """
+        self.responses = check_urls(self.urls, concurrency=concurrency)
+        for url, pid in self._urls.items():
+            if pid is None or pid in self.places:
+                continue
+            try:
+                r = self.responses[url]
+            except KeyError:
+                continue
+            self.places.add(pid, r)
+        return self.responses
+
+    def report(self):
+        """Summarize the plan: unique requests versus naive request count."""
+        return (
+            'prefetch plan for {} rows: {} unique requests instead of {} '
+            'row-by-row requests'.format(
+                self.rows, len(self._urls), self.naive))
@@ -0,0 +1,180 @@
+"""Persistent cache of transliterated and romanized name forms.
+
+Defines the class RomanizationCache, which keeps the output of polyglot
+transliteration and of unidecode "banalization" in an SQLite database, keyed
+by (kind, language, NFC-normalized input string, engine version), so that
+re-running massage-names.py -r or massage-calcs-names.py over an unchanged
+input file does no transliteration at all. Entries made with another version
+of the engine are simply not found, so upgrading polyglot or unidecode never
+serves stale output.
+
+The functions transliterate() and banalize() are how names.py and
+massage-calcs-names.py get romanized forms through the cache.
+
+"""
+from importlib.metadata import version, PackageNotFoundError
+import os
+import sqlite3
+import threading
+from transliteration import TRANSLITERATORS
+import unicodedata
+from unidecode import unidecode
+
+DEFAULT_ROMANIZATION_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'pleiades-batching',
+    'romanization.sqlite')
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS romanizations ('
+    'kind TEXT NOT NULL, language TEXT NOT NULL, source TEXT NOT NULL, '
+    'engine TEXT NOT NULL, value TEXT NOT NULL, '
+    'PRIMARY KEY (kind, language, source, engine)) WITHOUT ROWID',
+]
+
+
+def engine_version(package: str):
+    """Get '<package> <version>' for an installed package."""
+    try:
+        return '{} {}'.format(package, version(package))
+    except PackageNotFoundError:
+        return '{} unknown'.format(package)
+
+
+ENGINES = {
+    'transliterated': engine_version('polyglot'),
+    'banalized': engine_version('unidecode'),
+}
+
+
+class RomanizationCache:
+    """Keep romanized forms on disk for re-use across runs and processes."""
+
+    def __init__(self, path: str = DEFAULT_ROMANIZATION_CACHE_PATH):
+        """Open (or create) a romanization cache.
+
+        Args:
+            path: filepath of the SQLite cache database
+
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        dirname = os.path.dirname(path)
+        if dirname != '':
+            os.makedirs(dirname, exist_ok=True)
+
+    @property
+    def db(self):
+        """Get a connection to the database (one per process)."""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False,
+                isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def get(self, kind: str, language: str, source: str):
+        """Get a cached romanized form, or None if there isn't one.
+
+        Args:
+            kind: 'transliterated' or 'banalized' (see ENGINES)
+            language: language tag of source ('' if it does not matter)
+            source: NFC-normalized input string
+
+        """
+        key = (kind, language, source)
+        with self._lock:
+            try:
+                value = self._memo[key]
+            except KeyError:
+                row = self.db.execute(
+                    'SELECT value FROM romanizations WHERE kind = ? AND '
+                    'language = ? AND source = ? AND engine = ?',
+                    (kind, language, source, ENGINES[kind])).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                value = row[0]
+                self._memo[key] = value
+            self.hits += 1
+        return value
+
+    def put(self, kind: str, language: str, source: str, value: str):
+        """Store a romanized form (see get for the arguments)."""
+        with self._lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO romanizations VALUES (?, ?, ?, ?, ?)',
+                (kind, language, source, ENGINES[kind], value))
+            self._memo[(kind, language, source)] = value
+            self.stores += 1
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self.db.execute('DELETE FROM romanizations')
+            self._memo = {}
+
+    def stats(self):
+        """Get a dictionary of cache counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+        }
+
+
+CACHE = None
+
+
+def install_cache(path: str = DEFAULT_ROMANIZATION_CACHE_PATH):
+    """Create the cache used by transliterate() and banalize()."""
+    global CACHE
+    CACHE = RomanizationCache(path)
+    return CACHE
+
+
+def get_cache():
+    """Get the cache used by transliterate() and banalize()."""
+    if CACHE is None:
+        install_cache()
+    return CACHE
+
+
+def transliterate(text: str, language: str):
+    """Transliterate text from language into Latin script, via the cache.
+
+    Returns:
+        The polyglot transliteration (see transliteration.TRANSLITERATORS).
+
+    Exceptions raised:
+        - urllib.error.URLError: the transliteration model for language is
+          not cached and could not be loaded.
+
+    """
+    source = unicodedata.normalize('NFC', text)
+    cache = get_cache()
+    value = cache.get('transliterated', language, source)
+    if value is None:
+        value = TRANSLITERATORS.transliterate(source, language)
+        cache.put('transliterated', language, source, value)
+    return value
+
+
+def banalize(text: str):
+    """Reduce text to plain ASCII with unidecode, via the cache."""
+    source = unicodedata.normalize('NFC', text)
+    cache = get_cache()
+    value = cache.get('banalized', '', source)
+    if value is None:
+        value = unicodedata.normalize(
+            'NFC', unidecode(unicodedata.normalize('NFKD', source)))
+        cache.put('banalized', '', source, value)
+    return value
@@ -0,0 +1,110 @@
+"""Sanitize the summary and details of Pleiades names.
+
+Summaries must be plain text (checked by rendering them through html2text),
+and details may only contain the HTML allowed by bleach. Nearly all values in
+a batch are plain text, so the class Sanitizer first scans each value for
+the few characters either converter would act on and skips the converters
+entirely when there are none. Converters are configured once and re-used
+(one of each per thread, since neither is thread safe), and the number of
+values that took the fast and slow paths are counted.
+
+SANITIZER is the instance shared by all PleiadesName objects.
+
+"""
+import bleach
+from bleach.sanitizer import Cleaner
+import html2text
+import threading
+
+ALLOWED_TAGS = bleach.ALLOWED_TAGS
+ALLOWED_TAGS.extend(['p'])
+# characters bleach escapes or strips markup at
+MARKUP_CHARS = frozenset('<>&')
+# characters html2text escapes, drops, or converts anywhere in a string
+TEXT_CHARS = frozenset('<>&\\')
+# characters html2text escapes at the start of a line (markdown lists)
+TEXT_LEADERS = frozenset('+-0123456789')
+
+
+def is_plain_markup(v: str):
+    """Would bleach leave v unchanged (i.e., it has no markup or entities)?"""
+    return MARKUP_CHARS.isdisjoint(v)
+
+
+def is_plain_text(v: str):
+    """Would html2text render v unchanged?
+
+    Whitespace other than single spaces between words is collapsed by
+    html2text, so it too sends a value down the slow path.
+
+    """
+    return (
+        TEXT_CHARS.isdisjoint(v) and v[:1] not in TEXT_LEADERS
+        and ' '.join(v.split()) == v)
+
+
+class Sanitizer:
+    """Check summaries and clean details, skipping converters when possible."""
+
+    def __init__(self):
+        self.fast = 0
+        self.slow = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def converter(self):
+        """Get this thread's configured html2text converter."""
+        try:
+            return self._local.converter
+        except AttributeError:
+            h = html2text.HTML2Text()
+            h.ignore_links = True
+            h.ignore_images = True
+            h.ignore_emphasis = True
+            h.body_width = 0
+            self._local.converter = h
+            return h
+
+    @property
+    def cleaner(self):
+        """Get this thread's configured bleach cleaner."""
+        try:
+            return self._local.cleaner
+        except AttributeError:
+            c = Cleaner(tags=ALLOWED_TAGS, strip=True)
+            self._local.cleaner = c
+            return c
+
+    def _count(self, fast: bool):
+        with self._lock:
+            if fast:
+                self.fast += 1
+            else:
+                self.slow += 1
+
+    def to_text(self, v: str):
+        """Render v as plain text (as html2text would)."""
+        if is_plain_text(v):
+            self._count(True)
+            return v
+        self._count(False)
+        return self.converter.handle(v).strip()
+
+    def clean(self, v: str):
+        """Strip disallowed HTML from v (as bleach.clean would)."""
+        if is_plain_markup(v):
+            self._count(True)
+            return v
+        self._count(False)
+        return self.cleaner.clean(v)
+
+    def stats(self):
+        """Get a dictionary of sanitizer counters."""
+        return {
+            'fast': self.fast,
+            'slow': self.slow,
+        }
+
+
+SANITIZER = Sanitizer()
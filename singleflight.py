@@ -0,0 +1,64 @@
+"""Coalesce duplicate in-flight calls.
+
+Defines the class SingleFlight. When several threads ask it for the same key
+at the same moment (e.g., many names fetching the JSON of one parent place),
+only the first actually makes the call; the rest wait on a shared future
+and get the same result (or exception).
+
+"""
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, sharing its outcome."""
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Call func(*args, **kwargs) unless a call for key is in flight.
+
+        Args:
+            key: hashable identifier of the call (e.g., a URL)
+            func: callable to run
+
+        Returns:
+            The return value of func, whether from this call or from the
+            in-flight call that this one joined. An exception raised by func
+            is raised in every caller.
+
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            if future is None:
+                future = Future()
+                self._flights[key] = future
+                self.calls += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def stats(self):
+        """Get a dictionary of call counters."""
+        return {
+            'calls': self.calls,
+            'shared': self.shared,
+        }
@@ -0,0 +1,164 @@
+"""Offline, indexed snapshot of Pleiades place data.
+
+Defines the class PleiadesSnapshot, which stores the pids, place titles, and
+existing content slugs (names, locations, connections) found in a Pleiades
+places JSON dump (e.g., pleiades-places-latest.json.gz) in an on-disk SQLite
+database, so that validation can be done locally instead of over HTTP.
+
+"""
+import gzip
+import inspect
+import json
+import logging
+import os
+import sqlite3
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS places ('
+    'pid TEXT PRIMARY KEY, title TEXT NOT NULL) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS slugs ('
+    'pid TEXT NOT NULL, slug TEXT NOT NULL, kind TEXT NOT NULL, '
+    'PRIMARY KEY (pid, slug)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS meta ('
+    'key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID',
+]
+SLUG_KINDS = ['names', 'locations', 'connections']
+
+
+def read_dump(dump_fname: str):
+    """Read the list of places in a Pleiades places JSON dump.
+
+    Args:
+        dump_fname: filepath of the dump; gzipped dumps (.gz) are read
+            transparently
+
+    Returns:
+        A list of place dictionaries (the dump's "@graph").
+
+    """
+    if dump_fname.endswith('.gz'):
+        opener = gzip.open
+    else:
+        opener = open
+    with opener(dump_fname, 'rt', encoding='utf-8') as f:
+        dump = json.load(f)
+    try:
+        return dump['@graph']
+    except (KeyError, TypeError):
+        return dump
+
+
+class PleiadesSnapshot:
+    """Look up Pleiades pids, slugs, and place titles in a local store."""
+
+    def __init__(self, path: str):
+        """Open an existing snapshot store (read-only).
+
+        Args:
+            path: filepath of a snapshot store created with
+                PleiadesSnapshot.build() (or the build-snapshot.py script)
+
+        Exceptions raised:
+            - IOError: there is no snapshot store at path.
+
+        """
+        if not os.path.isfile(path):
+            raise IOError(
+                'Pleiades snapshot store "{}" does not exist.'.format(path))
+        self.path = path
+        self._db = None
+        self._db_pid = None
+        self.db
+
+    @property
+    def db(self):
+        """Get a read-only connection to the store (one per process)."""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(
+                'file:{}?mode=ro'.format(self.path), uri=True,
+                check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    @classmethod
+    def build(cls, dump_fname: str, path: str):
+        """Create (or replace) a snapshot store from a Pleiades JSON dump.
+
+        Args:
+            dump_fname: filepath of a Pleiades places JSON dump; gzipped
+                dumps (.gz) are read transparently
+            path: filepath to which to write the snapshot store
+
+        Returns:
+            A PleiadesSnapshot object opened on the new store.
+
+        """
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        places = read_dump(dump_fname)
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        db = sqlite3.connect(tmp_path)
+        for statement in SCHEMA:
+            db.execute(statement)
+        place_rows = []
+        slug_rows = []
+        for place in places:
+            pid = str(place['id'])
+            place_rows.append((pid, place.get('title', '')))
+            for kind in SLUG_KINDS:
+                for item in place.get(kind, []) or []:
+                    try:
+                        slug = item['id']
+                    except (KeyError, TypeError):
+                        continue
+                    slug_rows.append((pid, slug, kind))
+        with db:
+            db.executemany(
+                'INSERT OR REPLACE INTO places VALUES (?, ?)', place_rows)
+            db.executemany(
+                'INSERT OR REPLACE INTO slugs VALUES (?, ?, ?)', slug_rows)
+            db.execute(
+                'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                ('source', os.path.basename(dump_fname)))
+        db.close()
+        os.replace(tmp_path, path)
+        logger.info(
+            'wrote {} places and {} slugs from {} to snapshot store {}'
+            ''.format(len(place_rows), len(slug_rows), dump_fname, path))
+        return cls(path)
+
+    def has_pid(self, pid: str):
+        """Is there a place with this pid in the snapshot?"""
+        row = self.db.execute(
+            'SELECT 1 FROM places WHERE pid = ?', (pid,)).fetchone()
+        return row is not None
+
+    def has_slug(self, pid: str, slug: str):
+        """Is slug already in use within the place with this pid?"""
+        row = self.db.execute(
+            'SELECT 1 FROM slugs WHERE pid = ? AND slug = ?',
+            (pid, slug)).fetchone()
+        return row is not None
+
+    def slugs(self, pid: str):
+        """Get a list of all the slugs in use within a place."""
+        rows = self.db.execute(
+            'SELECT slug FROM slugs WHERE pid = ? ORDER BY slug', (pid,))
+        return [row[0] for row in rows]
+
+    def title(self, pid: str):
+        """Get the title of a place, or None if it is not in the snapshot."""
+        row = self.db.execute(
+            'SELECT title FROM places WHERE pid = ?', (pid,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
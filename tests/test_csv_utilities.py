@@ -0,0 +1,186 @@
+from csv_index import CSVIndex
+import csv_utilities
+from csv_utilities import DialectCache, iter_csv, open_csv, read_csv
+from nose.tools import assert_equal, assert_is_none, assert_true, raises
+from parallel_csv import read_csv_parallel, record_boundaries
+import os
+import tempfile
+import types
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+CSV = (
+    'nameid,pid,attested,romanized\n'
+    '1,295374,Moontown,\n'
+    '2,295374, ,Marstown\n')
+
+TMP = None
+SAVED_DIALECT_CACHE = None
+
+
+def setup_module():
+    # keep the files and dialect cache entries of these tests out of the
+    # user's cache
+    global TMP, SAVED_DIALECT_CACHE
+    TMP = tempfile.TemporaryDirectory()
+    SAVED_DIALECT_CACHE = csv_utilities.DIALECT_CACHE
+    csv_utilities.DIALECT_CACHE = DialectCache(
+        os.path.join(TMP.name, 'dialects.json'))
+
+
+def teardown_module():
+    csv_utilities.DIALECT_CACHE = SAVED_DIALECT_CACHE
+    TMP.cleanup()
+
+
+def make_dialect_cache():
+    return DialectCache(
+        os.path.join(tempfile.mkdtemp(dir=TMP.name), 'dialects.json'))
+
+
+def make_csv(text=CSV):
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=TMP.name)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def test_iter_csv():
+    path = make_csv()
+    field_names, rows = iter_csv(path, 'excel')
+    assert_equal(['nameid', 'pid', 'attested', 'romanized'], field_names)
+    assert_true(isinstance(rows, types.GeneratorType))
+    rows = list(rows)
+    assert_equal(
+        {'nameid': '1', 'pid': '295374', 'attested': 'Moontown'}, rows[0])
+    assert_equal(
+        {'nameid': '2', 'pid': '295374', 'romanized': 'Marstown'}, rows[1])
+
+
+def test_read_csv_matches_iter_csv():
+    path = make_csv()
+    rows, field_names = read_csv(path, 'excel')
+    assert_equal(list(iter_csv(path, 'excel')[1]), rows)
+
+
+def test_open_csv_cached():
+    path = make_csv()
+    fd, cache_path = tempfile.mkstemp(suffix='.json', dir=TMP.name)
+    os.close(fd)
+    os.remove(cache_path)
+    cache = DialectCache(cache_path)
+    dialect, field_names, rows = open_csv(path, cache=cache)
+    assert_equal('excel', dialect)
+    assert_equal(list(iter_csv(path, 'excel')[1]), list(rows))
+    other = DialectCache(cache_path)
+    assert_equal('excel', open_csv(path, cache=other)[0])
+    assert_equal({'hits': 1, 'misses': 0}, other.stats())
+
+
+def test_open_csv_bom():
+    path = make_csv('﻿' + CSV)
+    cache = make_dialect_cache()
+    dialect, field_names, rows = open_csv(path, cache=cache)
+    assert_equal('nameid', field_names[0])
+
+
+def test_open_csv_tab():
+    path = make_csv(CSV.replace(',', '\t'))
+    cache = make_dialect_cache()
+    assert_equal('excel-tab', open_csv(path, cache=cache)[0])
+    assert_equal('excel-tab', csv_utilities.test_csv(path))
+
+
+def test_open_csv_unregistered():
+    # the sniffer finds delimiter " " and quotechar "'" in this file
+    path = os.path.join(DATA_PATH, 'insc-israel-palestine', 'iip-places.csv')
+    cache = make_dialect_cache()
+    dialect, field_names, rows = open_csv(path, cache=cache)
+    assert_equal('excel', dialect)
+    assert_equal('Place_name', field_names[0])
+    assert_equal(list(iter_csv(path, 'excel')[1]), list(rows))
+    assert_equal('excel', csv_utilities.test_csv(path))
+
+
+def test_record_boundaries():
+    data = b'h1,h2\n1,"a\nb"\n2,c\n3,"x""\n"\n'
+    assert_equal([6, 14, 18, 27], record_boundaries(data, b'"', 1, start=6))
+    assert_equal([6, 27], record_boundaries(data, b'"', 100, start=6))
+
+
+def test_read_csv_parallel():
+    text = 'nameid,details\n' + ''.join(
+        '{},"line {}\nof ""{}"""\n'.format(i, i, i) if i % 3 == 0
+        else '{}, \n'.format(i) for i in range(50))
+    path = make_csv(text)
+    rows, field_names = read_csv_parallel(
+        path, 'excel', workers=2, chunk_size=64, min_size=0)
+    assert_equal((read_csv(path, 'excel')), (rows, field_names))
+
+
+def test_read_csv_parallel_bom():
+    text = '\ufeff' + 'nameid,details\n' + ''.join(
+        '{},"line {}\nof {}"\n'.format(i, i, i) for i in range(50))
+    path = make_csv(text)
+    rows, field_names = read_csv_parallel(
+        path, 'excel', 'utf-8-sig', workers=2, chunk_size=64, min_size=0)
+    assert_equal('nameid', field_names[0])
+    assert_equal((read_csv(path, 'excel', 'utf-8-sig')), (rows, field_names))
+
+
+def test_read_csv_parallel_stray_quote():
+    # the stray quote flips the quote count, so chunks are cut in records
+    text = 'nameid,details\n0,5" tall\n' + ''.join(
+        '{},"line {}\nof {}"\n'.format(i, i, i) for i in range(1, 50))
+    path = make_csv(text)
+    rows, field_names = read_csv_parallel(
+        path, 'excel', workers=2, chunk_size=64, min_size=0)
+    assert_equal(50, len(rows))
+    assert_equal((read_csv(path, 'excel')), (rows, field_names))
+    # both halves of a record cut in its last field have two fields
+    text = 'nameid,details\n0,5" tall\n' + ''.join(
+        '{},"line {}\nsee {}, also"\n'.format(i, i, i) for i in range(1, 50))
+    path = make_csv(text)
+    rows, field_names = read_csv_parallel(
+        path, 'excel', workers=2, chunk_size=64, min_size=0)
+    assert_equal(50, len(rows))
+    assert_equal((read_csv(path, 'excel')), (rows, field_names))
+
+
+def test_csv_index():
+    text = (
+        'nameid,term,details\n'
+        '1,roman,"two\nlines"\n'
+        '2,hellenistic-republican,\n'
+        '1,late-antique,"a ""quote"""\n')
+    path = make_csv(text)
+    with CSVIndex.build(path, 'nameid', 'excel') as index:
+        assert_equal(3, len(index))
+        assert_equal(
+            [{'nameid': '1', 'term': 'roman', 'details': 'two\nlines'},
+             {'nameid': '1', 'term': 'late-antique', 'details': 'a "quote"'}],
+            index.rows(['1', '3']))
+        with index.record(1) as record:
+            assert_equal(b'2,hellenistic-republican,\n', bytes(record))
+    with CSVIndex.load(path, 'nameid') as index:
+        assert_equal(
+            read_csv(path, 'excel')[0][1:2], index.rows(['2']))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('3,roman,\n')
+    assert_is_none(CSVIndex.load(path, 'nameid'))
+    with CSVIndex.open(path, 'nameid', 'excel') as index:
+        assert_equal([{'nameid': '3', 'term': 'roman'}], index.rows(['3']))
+    # an Excel "CSV UTF-8" export starts with a byte order mark
+    path = make_csv('\ufeff' + text)
+    with CSVIndex.open(path, 'nameid') as index:
+        assert_equal('nameid', index.field_names[0])
+        assert_equal(
+            read_csv(path, 'excel', 'utf-8-sig')[0][1:2], index.rows(['2']))
+    with CSVIndex.load(path, 'nameid') as index:
+        assert_equal(2, len(index.rows(['1'])))
+
+
+@raises(ValueError)
+def test_csv_index_stray_quote():
+    path = make_csv('nameid,details\n1,5" tall\n2,"two\nlines"\n')
+    CSVIndex.build(path, 'nameid', 'excel', save=False)
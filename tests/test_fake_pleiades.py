@@ -0,0 +1,171 @@
+from fake_pleiades import FakePleiades
+import http_cache
+import importlib.util
+import logging
+import multiprocessing
+from names import PleiadesName, PLACES
+from nose.tools import assert_equal, assert_true, raises
+import os
+from place_registry import PlaceRegistry
+from pleiades_client import PleiadesClient
+from prefetch import PrefetchPlan
+import sys
+import tempfile
+from validation import validate_names
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'massage-names.py')
+PID_200 = '857359'  # Trapezus in tests/data/test-places.json
+PID_404 = '1'
+
+FAKE = None
+SAVED_CACHE = None
+TMP = None
+
+
+def setup_module():
+    global FAKE, SAVED_CACHE, TMP
+    FAKE = FakePleiades.from_dump(os.path.join(DATA_PATH, 'test-places.json'))
+    FAKE.start()
+    SAVED_CACHE = http_cache.CACHE
+    TMP = tempfile.TemporaryDirectory()
+    http_cache.install_cache(os.path.join(TMP.name, 'http.sqlite'))
+
+
+def teardown_module():
+    FAKE.stop()
+    http_cache.CACHE = SAVED_CACHE
+    TMP.cleanup()
+
+
+def test_fake_pid_good():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown',
+        places=PlaceRegistry(FAKE.places_url))
+    assert_equal(PID_200, pn.pid)
+
+
+@raises(ValueError)
+def test_fake_pid_404():
+    pn = PleiadesName(
+        PID_404, language='en', attested='Moontown',
+        places=PlaceRegistry(FAKE.places_url))
+
+
+@raises(ValueError)
+def test_fake_slug_exists():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Trabzon', slug='trabzon',
+        places=PlaceRegistry(FAKE.places_url))
+
+
+def test_fake_summary():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown',
+        places=PlaceRegistry(FAKE.places_url))
+    pn.generate_summary()
+    assert_true('Trapezus' in pn.summary)
+
+
+@raises(ValueError)
+def test_fake_summary_untitled():
+    with FakePleiades([{'id': '295374', 'names': []}]) as fake:
+        pn = PleiadesName(
+            '295374', language='en', attested='Moontown',
+            places=PlaceRegistry(fake.places_url))
+        pn.generate_summary()
+
+
+def test_fake_validate_names():
+    places = PlaceRegistry(FAKE.places_url)
+    rows = [
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moontown',
+            'slug': 'moontown'},
+        {'pid': PID_200, 'language': 'en', 'attested': 'Trabzon',
+            'slug': 'trabzon'},
+        {'pid': PID_404, 'language': 'en', 'attested': 'Moontown'},
+    ]
+    results = validate_names(rows, places=places)
+    assert_true(results[0][1] is None)
+    assert_true(isinstance(results[1][1], ValueError))
+    assert_true(isinstance(results[2][1], ValueError))
+    assert_equal(2, len(places))
+    assert_equal(0, places.fetches)  # all prefetched
+
+
+def test_fake_errors():
+    with FakePleiades([], error_rate=1) as fake:
+        client = PleiadesClient(retries=2, backoff=0)
+        r = client.get(fake.places_url + '/' + PID_200 + '/json')
+        assert_equal(503, r.status_code)
+        assert_equal(3, fake.stats()['errors'])
+
+
+def test_fake_conditional():
+    client = PleiadesClient()
+    url = FAKE.places_url + '/' + PID_200 + '/json'
+    r = client.get(url)
+    assert_equal('Trapezus', r.json()['title'])
+    r = client.get(url, etag=r.headers['ETag'])
+    assert_equal(304, r.status_code)
+
+
+def load_massage_names():
+    spec = importlib.util.spec_from_file_location(
+        'massage_names', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['massage_names'] = module  # so workers can unpickle tasks
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_fake_massage_in_workers():
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return
+    massage_names = load_massage_names()
+    items = [
+        {'nameid': '1', 'pid': PID_200, 'language': 'en',
+            'attested': 'Moontown'},
+        {'nameid': '2', 'pid': PID_404, 'language': 'en',
+            'attested': 'Moontown'},
+        {'nameid': '3', 'pid': PID_200, 'language': 'en',
+            'attested': 'Marstown'},
+    ]
+    rows = [{k: v for k, v in item.items() if k != 'nameid'}
+            for item in items]
+    saved_url = PLACES.places_url
+    PLACES.places_url = FAKE.places_url
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            plan = PrefetchPlan(generate_summaries=True)
+            plan.extend(rows)
+            plan.execute()
+            state = {
+                'plan': plan,
+                'snapshot_path': None,
+                'http_fallback': True,
+                'time_periods': {'1': ['roman']},
+                'romanize': False,
+                'sluggify': False,
+                'abstract': True,
+                'places_url': FAKE.places_url,
+                'client': PleiadesClient().settings(),
+                'cache': {'path': os.path.join(tmp, 'http.sqlite')},
+                'romanization_cache': os.path.join(tmp, 'romanization.sqlite'),
+            }
+            results = massage_names.massage_in_workers(items, state, 2)
+    finally:
+        PLACES.places_url = saved_url
+    assert_equal(3, len(results))
+    d, records = results[0]
+    assert_equal('1', d['nameid'])
+    assert_equal(['roman'], d['time_periods'])
+    assert_true('Trapezus' in d['summary'])
+    d, records = results[1]
+    assert_true(d is None)
+    assert_equal(logging.CRITICAL, records[0][0])
+    d, records = results[2]
+    assert_equal('3', d['nameid'])
+    assert_equal(logging.WARNING, records[0][0])
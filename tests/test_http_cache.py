@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from http_cache import ResponseCache
+from nose.tools import assert_equal, assert_true
+import os
+from singleflight import SingleFlight
+import tempfile
+import threading
+import time
+
+TMP = None
+
+
+def setup_module():
+    global TMP
+    TMP = tempfile.TemporaryDirectory()
+
+
+def teardown_module():
+    TMP.cleanup()
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Type': 'application/json'}
+
+
+def make_cache(**kwargs):
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    return ResponseCache(path, **kwargs)
+
+
+def test_cache_hit():
+    cache = make_cache()
+    url = 'https://example.org/places/1/json'
+    assert_true(cache.get(url) is None)
+    cache.put(url, FakeResponse(200, b'{"title": "Moontown"}'))
+    r = cache.get(url)
+    assert_equal(200, r.status_code)
+    assert_equal('Moontown', r.json()['title'])
+    assert_equal(1, cache.stats()['hits'])
+    assert_equal(1, cache.stats()['misses'])
+
+
+def test_cache_persistent():
+    cache = make_cache()
+    url = 'https://example.org/places/1/json'
+    cache.put(url, FakeResponse(200, b'{}'))
+    other = ResponseCache(cache.path)
+    assert_equal(200, other.get(url).status_code)
+
+
+def test_cache_negative():
+    cache = make_cache()
+    url = 'https://example.org/places/1/moontown'
+    cache.put(url, FakeResponse(404, b'<html>Not found</html>'))
+    assert_equal(404, cache.get(url).status_code)
+    assert_equal(1, cache.stats()['negative_hits'])
+
+
+def test_cache_uncacheable():
+    cache = make_cache()
+    url = 'https://example.org/places/1/json'
+    cache.put(url, FakeResponse(503))
+    assert_true(cache.get(url) is None)
+
+
+def test_cache_ttl():
+    cache = make_cache(ttl=0.01)
+    url = 'https://example.org/places/1/json'
+    cache.put(url, FakeResponse(200, b'{}'))
+    time.sleep(0.02)
+    assert_true(cache.get(url) is None)
+
+
+def test_cache_negative_ttl():
+    cache = make_cache(negative_ttl=0.01)
+    cache.put('https://example.org/places/1/json', FakeResponse(200, b'{}'))
+    cache.put('https://example.org/places/1/moontown', FakeResponse(404))
+    time.sleep(0.02)
+    assert_true(cache.get('https://example.org/places/1/moontown') is None)
+    assert_true(cache.get('https://example.org/places/1/json') is not None)
+
+
+def test_cache_eviction():
+    cache = make_cache(max_entries=2)
+    for i in range(3):
+        cache.put(
+            'https://example.org/places/{}/json'.format(i),
+            FakeResponse(200, b'{}'))
+        time.sleep(0.001)
+    cache.get('https://example.org/places/0/json')
+    cache.put('https://example.org/places/3/json', FakeResponse(200, b'{}'))
+    cache.evict()
+    assert_true(cache.get('https://example.org/places/0/json') is not None)
+    assert_true(cache.get('https://example.org/places/1/json') is None)
+    assert_equal(2, cache.stats()['evictions'])
+
+
+def test_singleflight():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    counter = []
+
+    def slow():
+        counter.append(1)
+        started.set()
+        release.wait(5)
+        return 'Moontown'
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, 'url', slow)
+        started.wait(5)
+        followers = [
+            executor.submit(flights.do, 'url', slow) for i in range(3)]
+        while flights.shared < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [f.result() for f in [leader] + followers]
+    assert_equal(['Moontown'] * 4, results)
+    assert_equal(1, len(counter))
+    assert_equal({'calls': 1, 'shared': 3}, flights.stats())
@@ -1,15 +1,56 @@
+import argparse
+from batch_romanization import romanize_batch
+from codepoints import TABLE as CODEPOINTS
 from distutils.util import strtobool
+import http_cache
+import importlib.util
+import json
+from language_detection import LanguageDetection, script_of
+from language_resolver import LanguageTagResolver
 import logging
-from names import PleiadesName
+from name_table import NameTable, RULES
+from names import PleiadesName, to_rows
 from nose.tools import raises, assert_equal, assert_true, assert_false
+import os
+import romanization_cache
+from romanization_cache import RomanizationCache
+from sanitization import Sanitizer
+from place_registry import PlaceRegistry
+from prefetch import PrefetchPlan
+from snapshot import PleiadesSnapshot
 import sys
+import tempfile
 from testconfig import config
+from transliteration import TransliteratorPool
+from unicode_normalization import normalize_batch, normalize_unicode
+from urllib.error import URLError
+from validation import validate_deferred, validate_names
 from vocabularies import VOCABULARIES
+from vocabulary_store import compile_store, parse_vocabulary_text
+from vocabulary_store import VocabularyStore
 
 PID_404 = '1'  # doesn't exist
 PID_200 = '857359'  # Trapezus https://pleiades.stoa.org/places/857359
 
 SKIP_HTTP_TESTS = bool(strtobool(config['error_handling']['skip_http_tests']))
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+
+TMP = None
+SAVED_CACHE = None
+
+
+def setup_module():
+    # keep HTTP responses fetched by these tests out of the user's cache
+    global TMP, SAVED_CACHE
+    TMP = tempfile.TemporaryDirectory()
+    SAVED_CACHE = http_cache.CACHE
+    http_cache.install_cache(os.path.join(TMP.name, 'http.sqlite'))
+
+
+def teardown_module():
+    http_cache.CACHE = SAVED_CACHE
+    TMP.cleanup()
+
 
 # Pleiades IDs (pid)
 # ---------------------------------------------------------------------------
@@ -478,3 +519,540 @@ def test_details_badhtml():
         skip_http_tests=SKIP_HTTP_TESTS)
     assert_equal(d, pn.details)
 
+
+# offline snapshot
+# ---------------------------------------------------------------------------
+def make_snapshot():
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    return PleiadesSnapshot.build(
+        os.path.join(DATA_PATH, 'test-places.json'), path)
+
+
+def test_snapshot_lookups():
+    snapshot = make_snapshot()
+    assert_true(snapshot.has_pid(PID_200))
+    assert_false(snapshot.has_pid(PID_404))
+    assert_true(snapshot.has_slug(PID_200, 'trapezus'))
+    assert_false(snapshot.has_slug(PID_200, 'moontown'))
+    assert_equal(snapshot.title(PID_200), 'Trapezus')
+    assert_equal(
+        snapshot.slugs(PID_200),
+        ['darmc-location-20477', 'trabzon', 'trapezus'])
+
+
+def test_snapshot_pid_good():
+    pn = PleiadesName(
+        PID_200,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        snapshot=make_snapshot(),
+        http_fallback=False)
+    assert_equal(PID_200, pn.pid)
+
+
+@raises(ValueError)
+def test_snapshot_pid_missing():
+    pn = PleiadesName(
+        PID_404,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        snapshot=make_snapshot(),
+        http_fallback=False)
+
+
+@raises(ValueError)
+def test_snapshot_slug_exists():
+    pn = PleiadesName(
+        PID_200,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        slug='trapezus',
+        snapshot=make_snapshot(),
+        http_fallback=False)
+
+
+def test_snapshot_slug_good():
+    pn = PleiadesName(
+        PID_200,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        slug='moontown',
+        snapshot=make_snapshot(),
+        http_fallback=False)
+    assert_equal('moontown', pn.slug)
+
+
+# batch validation
+# ---------------------------------------------------------------------------
+def test_validate_names():
+    rows = [
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moontown'},
+        {'pid': '5fid&', 'language': 'en', 'attested': 'Moontown'},
+        {'pid': PID_200, 'language': 'en'},
+    ]
+    results = validate_names(
+        rows, concurrency=2, skip_http_tests=SKIP_HTTP_TESTS)
+    assert_equal(len(rows), len(results))
+    pn, exc = results[0]
+    assert_equal(PID_200, pn.pid)
+    assert_true(exc is None)
+    for pn, exc in results[1:]:
+        assert_true(pn is None)
+        assert_true(isinstance(exc, ValueError))
+
+
+# deferred validation
+# ---------------------------------------------------------------------------
+def test_deferred_stores_invalid():
+    pn = PleiadesName(
+        ' 5fid& ', language='xx-bogus', attested='Moontown',
+        name_type='bogus', defer_validation=True)
+    assert_equal('5fid&', pn.pid)
+    assert_equal('bogus', pn.name_type)
+    assert_false(pn.validated)
+
+
+@raises(ValueError)
+def test_deferred_validate_bad():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown', name_type='bogus',
+        defer_validation=True)
+    pn.validate(remote=False)
+
+
+def test_deferred_validate_good():
+    pn = PleiadesName(
+        PID_200, attested='Moontown', language='en',
+        details='<script>x</script><p>ok</p>',
+        skip_http_tests=SKIP_HTTP_TESTS, places=make_registry(),
+        defer_validation=True)
+    pn.validate()
+    assert_true(pn.validated)
+    assert_false('<script>' in pn.details)
+
+
+def test_validate_deferred():
+    places = make_registry()
+    names = [
+        PleiadesName(
+            pid, language='en', attested='Moontown', places=places,
+            defer_validation=True)
+        for pid in [PID_200, '5fid&', PID_404]]
+    results = validate_deferred(names, places=places)
+    assert_true(results[0][1] is None)
+    assert_true(results[0][0].validated)
+    assert_true(isinstance(results[1][1], ValueError))
+    assert_true(isinstance(results[2][1], ValueError))
+
+
+# place registry
+# ---------------------------------------------------------------------------
+class FakeResponse:
+    def __init__(self, status_code, place=None):
+        self.status_code = status_code
+        self.place = place
+
+    def json(self):
+        return self.place
+
+
+def make_registry():
+    places = PlaceRegistry('https://example.org/places')
+    places.add(PID_200, FakeResponse(200, {'title': 'Trapezus'}))
+    places.add(PID_404, FakeResponse(404))
+    return places
+
+
+def test_registry_pid_good():
+    places = make_registry()
+    pn = PleiadesName(
+        PID_200,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        places=places)
+    assert_equal(PID_200, pn.pid)
+    assert_equal(0, places.fetches)
+
+
+@raises(ValueError)
+def test_registry_pid_404():
+    pn = PleiadesName(
+        PID_404,
+        summary='foo',
+        attested='Moontown',
+        language='en',
+        places=make_registry())
+
+
+def test_registry_summary():
+    places = make_registry()
+    pn = PleiadesName(
+        PID_200,
+        attested='Moontown',
+        language='en',
+        places=places)
+    pn.generate_summary()
+    assert_equal(
+        'English-language name associated with Trapezus.', pn.summary)
+    assert_equal(2, places.lookups)
+    assert_equal(0, places.fetches)
+
+
+# prefetch planning
+# ---------------------------------------------------------------------------
+def test_prefetch_plan():
+    plan = PrefetchPlan(
+        places=PlaceRegistry('https://example.org/places'),
+        generate_slugs=True,
+        generate_summaries=True)
+    plan.extend([
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moontown'},
+        {'pid': PID_200, 'language': 'en', 'romanized': 'Moontown, Mun'},
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moon Road',
+         'slug': 'moon-road'},
+        {'pid': '5fid&', 'language': 'en', 'attested': 'Moontown'},
+    ])
+    assert_equal(4, plan.rows)
+    assert_equal(10, plan.naive)
+    assert_equal(3, len(plan.urls))
+    assert_true(plan.urls[1].endswith('/{}/moontown'.format(PID_200)))
+
+
+# language detection
+# ---------------------------------------------------------------------------
+def test_detection_memoized():
+    detection = LanguageDetection()
+    texts = ['Moontown', 'Moontown', 'Trebizond']
+    results = detection.detect_batch(texts)
+    assert_equal(2, len(results))
+    detection.detect('Moontown')
+    assert_equal(1, detection.stats()['hits'])
+    assert_equal(2, detection.stats()['misses'])
+
+
+def test_detection_prescreen():
+    detection = LanguageDetection()
+    assert_equal('Arab', script_of('جنوة'))
+    assert_true(script_of('Ἀθῆναι Moontown') is None)
+    assert_true(detection.prescreen('جنوة', 'Arab'))
+    assert_false(detection.prescreen('Moontown', 'Latn'))
+    assert_false(detection.prescreen('Ἀθῆναι', 'Arab'))
+    assert_equal(1, detection.stats()['prescreened'])
+
+
+# transliterator pool
+# ---------------------------------------------------------------------------
+class FakeTransliterator:
+    def __init__(self, source_lang, target_lang):
+        if source_lang == 'xx':
+            raise URLError('no model')
+        self.source_lang = source_lang
+
+    def transliterate(self, text):
+        return text.upper()
+
+
+def test_transliterator_pool():
+    pool = TransliteratorPool(factory=FakeTransliterator)
+    assert_equal('ABC', pool.transliterate('abc', 'ar'))
+    assert_equal('DEF', pool.transliterate('def', 'ar'))
+    pool.get('el')
+    assert_equal(2, pool.stats()['loads'])
+    assert_equal(1, pool.stats()['reuses'])
+    assert_true(('ar', 'en') in pool)
+
+
+@raises(URLError)
+def test_transliterator_pool_error():
+    pool = TransliteratorPool(factory=FakeTransliterator)
+    try:
+        pool.get('xx')
+    finally:
+        assert_equal(0, len(pool))
+
+
+# romanization cache
+# ---------------------------------------------------------------------------
+def test_romanization_cache():
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    cache = RomanizationCache(path)
+    assert_true(cache.get('banalized', '', 'Ἀθῆναι') is None)
+    cache.put('banalized', '', 'Ἀθῆναι', 'Athenai')
+    other = RomanizationCache(path)
+    assert_equal('Athenai', other.get('banalized', '', 'Ἀθῆναι'))
+    assert_true(other.get('transliterated', 'el', 'Ἀθῆναι') is None)
+    assert_equal(1, other.stats()['hits'])
+    assert_equal(1, other.stats()['misses'])
+
+
+def test_banalize_cached():
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    saved = romanization_cache.CACHE
+    cache = romanization_cache.install_cache(path)
+    try:
+        assert_equal('Kerkyra', romanization_cache.banalize('Kérkyra'))
+        assert_equal('Kerkyra', romanization_cache.banalize('Kérkyra'))
+        assert_equal(1, cache.stats()['stores'])
+        assert_equal(1, cache.stats()['hits'])
+    finally:
+        romanization_cache.CACHE = saved
+
+
+# batch romanization
+# ---------------------------------------------------------------------------
+def test_romanize_batch():
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    saved = romanization_cache.CACHE
+    romanization_cache.install_cache(path)
+    try:
+        records = [
+            ('en', 'Kérkyra'), ('xx-bogus', 'Moontown'), ('fr', 'Nîmes'),
+            ('en', 'Kérkyra')]
+        results = romanize_batch(records)
+        assert_equal(len(records), len(results))
+        assert_equal(('Kerkyra', None), results[0])
+        assert_equal(results[0], results[3])
+        assert_true(isinstance(results[1][1], AttributeError))
+        assert_equal('Nimes', results[2][0])
+    finally:
+        romanization_cache.CACHE = saved
+
+
+
+def test_massage_calcs_names_blank_attested():
+    spec = importlib.util.spec_from_file_location(
+        'massage_calcs_names',
+        os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            'massage-calcs-names.py'))
+    massage_calcs_names = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(massage_calcs_names)
+    src = os.path.join(TMP.name, 'calcs-names.json')
+    dest = os.path.join(TMP.name, 'calcs-names-out.json')
+    name = {
+        'attested': '', 'transliterated': 'Trapezous', 'language': 'grc',
+        'details': '', 'periods': ['modern'], 'pid': PID_200,
+        'ref1': '', 'ref1url': '', 'ref2': '', 'ref2url': ''}
+    with open(src, 'w', encoding='utf-8') as f:
+        json.dump({'1': name}, f)
+    saved = romanization_cache.CACHE
+    try:
+        massage_calcs_names.main(argparse.Namespace(
+            source=src, destination=dest, snapshot='',
+            romanization_cache=os.path.join(TMP.name, 'calcs.sqlite'),
+            jobs=0, language_lookup=''))
+    finally:
+        romanization_cache.CACHE = saved
+    with open(dest, 'r', encoding='utf-8') as f:
+        updates = json.load(f)['updates']
+    directives = updates[0]['Name::/places/{}/trapezous'.format(PID_200)]
+    assert_equal('Trapezous', directives['romanized']['values'])
+    assert_true('attested' not in directives)
+
+
+# language tag resolver
+# ---------------------------------------------------------------------------
+def test_language_resolver():
+    resolver = LanguageTagResolver()
+    info = resolver.resolve('ar-Latn')
+    assert_true(info.valid)
+    assert_equal('Latn', info.script)
+    assert_equal('Arabic', info.language_description)
+    assert_equal('Latin', info.script_description)
+    assert_false(resolver.check('xx-bogus'))
+    resolver.resolve('ar-Latn')
+    assert_equal(2, resolver.stats()['resolutions'])
+    fd, path = tempfile.mkstemp(suffix='.json', dir=TMP.name)
+    os.close(fd)
+    resolver.save(path)
+    other = LanguageTagResolver(path)
+    assert_equal(info, other.resolve('ar-Latn'))
+    assert_equal(0, other.stats()['resolutions'])
+
+
+# unicode normalization
+# ---------------------------------------------------------------------------
+def test_normalize_unicode():
+    assert_equal(('Moontown', 'Moontown'), normalize_unicode('Moontown'))
+    decomposed = 'Kérkyra'
+    assert_equal(('Kérkyra', 'Kérkyra'), normalize_unicode(decomposed))
+    assert_equal(('ﬁve', 'five'), normalize_unicode('ﬁve'))
+
+
+def test_normalize_batch():
+    normalized, divergences = normalize_batch(
+        ['Moontown', 'Kérkyra', 'ﬁve'])
+    assert_equal(['Moontown', 'Kérkyra', 'ﬁve'], normalized)
+    assert_equal(1, len(divergences))
+    assert_equal(2, divergences[0].index)
+    assert_equal('five', divergences[0].compatibility)
+
+
+@raises(ValueError)
+def test_unicode_divergence():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown', details='ﬁve',
+        skip_http_tests=True)
+
+
+def test_unicode_divergence_ignored():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown', details='ﬁve',
+        skip_http_tests=True, ignore_unicode_errors=True)
+    assert_equal('ﬁve', pn.details)
+
+
+# codepoint table
+# ---------------------------------------------------------------------------
+def test_codepoints_ranges_used():
+    assert_equal(
+        frozenset(['basic_latin', 'latin_extended_a']),
+        CODEPOINTS.ranges_used('Athēnai'))
+    assert_true(None in CODEPOINTS.ranges_used('Athens 中'))
+
+
+def test_codepoints_romanized_column():
+    assert_equal(
+        [True, True, False],
+        CODEPOINTS.romanized_column(['Athēnai', '', 'Ἀθῆναι']))
+
+
+def test_codepoints_scripts_used():
+    assert_equal(frozenset(['Grek']), CODEPOINTS.scripts_used('Ἀθῆναι 1'))
+    assert_equal(
+        frozenset(['Grek', 'Latn']), CODEPOINTS.scripts_used('Ἀθῆναι Athens'))
+    assert_equal(frozenset(), CODEPOINTS.scripts_used('1, 2'))
+
+
+# summary and details sanitizing
+# ---------------------------------------------------------------------------
+def test_sanitizer_fast_path():
+    sanitizer = Sanitizer()
+    assert_equal('A moon town.', sanitizer.to_text('A moon town.'))
+    assert_equal('Moon &amp; town', sanitizer.clean('Moon &amp; town'))
+    assert_equal('cheese', sanitizer.clean('cheese'))
+    assert_equal({'fast': 2, 'slow': 1}, sanitizer.stats())
+
+
+def test_sanitizer_slow_path():
+    sanitizer = Sanitizer()
+    assert_equal('moon', sanitizer.to_text('<p>moon</p>'))
+    assert_equal('1\\. moon', sanitizer.to_text('1. moon'))
+    assert_equal('moon', sanitizer.clean('<span>moon</span>'))
+    assert_equal(3, sanitizer.stats()['slow'])
+
+
+# name records
+# ---------------------------------------------------------------------------
+def test_name_slots():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown',
+        skip_http_tests=True)
+    assert_false(hasattr(pn, '__dict__'))
+
+
+def test_name_to_dict():
+    pn = PleiadesName(
+        PID_200, language='en', attested='Moontown',
+        skip_http_tests=True)
+    d = pn.to_dict()
+    assert_equal('Moontown', d['attested'])
+    assert_equal('Latn', d['language_script'])
+    assert_false('slug' in d)
+    assert_equal('', pn.to_dict(omit_empty=False)['slug'])
+
+
+def test_name_to_rows():
+    names = [
+        PleiadesName(
+            PID_200, language='en', attested=a, skip_http_tests=True)
+        for a in ['Moontown', 'Marstown']]
+    assert_equal(
+        [('Moontown', 'en'), ('Marstown', 'en')],
+        to_rows(names, ('attested', 'language')))
+    assert_equal([('Moontown',), ('Marstown',)], to_rows(names, ['attested']))
+
+
+# column-wise triage
+# ---------------------------------------------------------------------------
+def test_name_table():
+    table = NameTable.from_rows([
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moontown'},
+        {'pid': 'moon', 'language': 'en', 'romanized': 'Ἀθῆναι'},
+        {'pid': PID_200, 'language': 'en', 'attested': 'Moontown',
+         'name_type': 'lunar', 'slug': 'Moon Town'},
+    ])
+    matrix = table.validate()
+    assert_equal(3, len(matrix))
+    assert_equal([None] * len(RULES), matrix[0])
+    failures = table.failures()
+    assert_equal([1, 2], sorted(failures.keys()))
+    assert_equal(2, len(failures[1]))
+    assert_true(matrix[2][RULES.index('name_type')].startswith('unknown'))
+    assert_true(matrix[2][RULES.index('slug')].startswith('malformed'))
+
+
+@raises(ValueError)
+def test_name_table_ragged():
+    NameTable({'pid': [PID_200], 'language': []})
+
+
+# vocabulary store
+# ---------------------------------------------------------------------------
+def test_vocabulary_store_fallback():
+    store = VocabularyStore(tempfile.mkdtemp(dir=TMP.name))
+    assert_equal(
+        frozenset(VOCABULARIES['name_type'].keys()), store.terms('name_type'))
+    assert_true(store.check('name_type', 'geographic'))
+    assert_equal(1, store.loads)
+
+
+def test_vocabulary_store_compiled():
+    path = tempfile.mkdtemp(dir=TMP.name)
+    compile_store(path, parse_vocabulary_text(
+        '* [Roman, early](https://pleiades.stoa.org/vocabularies/'
+        'time-periods/roman-early)\n'))
+    store = VocabularyStore(path)
+    assert_equal(frozenset(['roman-early']), store.terms('time_periods'))
+    try:
+        store.check('time_periods', 'modern')
+    except ValueError as exc:
+        assert_true('"roman-early."' in str(exc))
+    else:
+        raise AssertionError('ValueError not raised')
+
+
+def test_vocabulary_store_lazy_message():
+    class Terms:
+        def __init__(self):
+            self.joined = 0
+
+        def __iter__(self):
+            self.joined += 1
+            return iter(['geographic', 'ethnic'])
+
+    class Definitions(dict):
+        def keys(self):
+            return terms
+
+    terms = Terms()
+    store = VocabularyStore(tempfile.mkdtemp(dir=TMP.name))
+    store._definitions['name_type'] = Definitions(geographic='', ethnic='')
+    store._terms['name_type'] = frozenset(['geographic', 'ethnic'])
+    try:
+        store.check('name_type', 'bogus')
+    except ValueError as exc:
+        assert_equal(0, terms.joined)
+        assert_true('"geographic", "ethnic."' in str(exc))
+        assert_equal(1, terms.joined)
+    else:
+        raise AssertionError('ValueError not raised')
@@ -0,0 +1,120 @@
+from http_cache import ResponseCache
+from nose.tools import assert_equal, assert_raises, assert_true
+import os
+from pleiades_client import AdaptiveLimiter, PleiadesClient
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+import tempfile
+
+TMP = None
+
+
+def setup_module():
+    global TMP
+    TMP = tempfile.TemporaryDirectory()
+
+
+def teardown_module():
+    TMP.cleanup()
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Transport adapter that answers with a fixed sequence of statuses."""
+
+    def __init__(self, statuses, headers=None):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        status = self.statuses.pop(0)
+        if status is None:
+            raise ConnectionError('scripted connection error')
+        r = Response()
+        r.status_code = status
+        r.headers.update(self.headers)
+        r._content = b'{}'
+        r.url = request.url
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+def make_client(statuses, headers=None, **kwargs):
+    kwargs.setdefault('backoff', 0)
+    client = PleiadesClient(**kwargs)
+    adapter = ScriptedAdapter(statuses, headers)
+    client.session.mount('https://', adapter)
+    return client, adapter
+
+
+def test_limiter_increase():
+    limiter = AdaptiveLimiter(initial=2, maximum=3, latency_target=1)
+    for i in range(10):
+        limiter.success(0.1)
+    assert_equal(3, limiter.limit)
+
+
+def test_limiter_decrease():
+    limiter = AdaptiveLimiter(initial=8, minimum=1, latency_target=1)
+    limiter.congestion()
+    assert_equal(4, limiter.limit)
+    limiter.success(5)  # too slow
+    assert_equal(2, limiter.limit)
+    for i in range(5):
+        limiter.congestion()
+    assert_equal(1, limiter.limit)
+    assert_equal(7, limiter.decreases)
+
+
+def test_client_retry():
+    client, adapter = make_client([503, None, 200])
+    r = client.get('https://example.org/places/1/json')
+    assert_equal(200, r.status_code)
+    assert_equal(3, client.stats()['attempts'])
+    assert_equal(2, client.stats()['limit_decreases'])
+
+
+def test_client_give_up():
+    client, adapter = make_client([503, 503], retries=1)
+    r = client.get('https://example.org/places/1/json')
+    assert_equal(503, r.status_code)
+    client, adapter = make_client([None, None], retries=1)
+    assert_raises(
+        ConnectionError, client.get, 'https://example.org/places/1/json')
+
+
+def test_client_no_retry_404():
+    client, adapter = make_client([404, 200])
+    r = client.get('https://example.org/places/1/json')
+    assert_equal(404, r.status_code)
+    assert_equal(1, len(adapter.sent))
+
+
+def test_client_conditional():
+    client, adapter = make_client([304])
+    r = client.get(
+        'https://example.org/places/1/json', etag='"abc"',
+        last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    assert_equal(304, r.status_code)
+    assert_equal('"abc"', adapter.sent[0].headers['If-None-Match'])
+    assert_equal(1, client.stats()['not_modified'])
+
+
+def test_cache_revalidate():
+    fd, path = tempfile.mkstemp(suffix='.sqlite', dir=TMP.name)
+    os.close(fd)
+    cache = ResponseCache(path, ttl=0)
+    url = 'https://example.org/places/1/json'
+    client, adapter = make_client([200], headers={'ETag': '"abc"'})
+    cache.put(url, client.get(url))
+    assert_true(cache.get(url) is None)  # stale
+    assert_equal(('"abc"', None), cache.validators(url))
+    r = cache.revalidate(url)
+    assert_equal(200, r.status_code)
+    assert_equal(1, cache.stats()['revalidations'])
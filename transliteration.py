@@ -0,0 +1,104 @@
+"""Shared pool of polyglot transliterators.
+
+Loading a polyglot transliteration model costs far more than using it, so
+the class TransliteratorPool loads each one lazily, at most once per process,
+keyed by (source_lang, target_lang), and hands the same Transliterator to
+every caller after that. Concurrent first requests for the same language
+pair share a single load.
+
+TRANSLITERATORS is the pool shared by names.py and massage-calcs-names.py.
+
+"""
+from polyglot.transliteration import Transliterator
+from singleflight import SingleFlight
+import threading
+import time
+
+
+class TransliteratorPool:
+    """Load polyglot Transliterators on demand and keep them for reuse."""
+
+    def __init__(self, factory=Transliterator):
+        """Create an empty pool.
+
+        Args:
+            factory: callable taking source_lang and target_lang keyword
+                arguments and returning an object with a transliterate()
+                method (default: polyglot's Transliterator)
+
+        """
+        self.factory = factory
+        self.loads = 0
+        self.reuses = 0
+        self.load_time = 0.0
+        self._pool = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def __contains__(self, key):
+        return key in self._pool
+
+    def __len__(self):
+        return len(self._pool)
+
+    def get(self, source_lang: str, target_lang: str = 'en'):
+        """Get the transliterator for a language pair, loading it if need be.
+
+        Args:
+            source_lang: language tag of the text to transliterate
+            target_lang: language tag of the output (default: 'en')
+
+        Returns:
+            A polyglot.transliteration.Transliterator object.
+
+        Exceptions raised:
+            - urllib.error.URLError (and whatever else polyglot raises): the
+              model could not be loaded. Failed loads are not kept, so the
+              next request for the pair tries again.
+
+        """
+        key = (source_lang, target_lang)
+        try:
+            transliterator = self._pool[key]
+        except KeyError:
+            return self._flights.do(key, self._load, key)
+        with self._lock:
+            self.reuses += 1
+        return transliterator
+
+    def _load(self, key):
+        try:
+            return self._pool[key]  # loaded while waiting to load
+        except KeyError:
+            pass
+        started = time.monotonic()
+        transliterator = self.factory(
+            source_lang=key[0], target_lang=key[1])
+        with self._lock:
+            self.loads += 1
+            self.load_time += time.monotonic() - started
+            self._pool[key] = transliterator
+        return transliterator
+
+    def transliterate(
+        self, text: str, source_lang: str, target_lang: str = 'en'
+    ):
+        """Transliterate text with the pooled transliterator."""
+        return self.get(source_lang, target_lang).transliterate(text)
+
+    def stats(self):
+        """Get a dictionary of pool counters."""
+        return {
+            'transliterators': len(self._pool),
+            'loads': self.loads,
+            'reuses': self.reuses,
+            'load_time': round(self.load_time, 3),
+        }
+
+    def clear(self):
+        """Drop all loaded transliterators."""
+        with self._lock:
+            self._pool = {}
+
+
+TRANSLITERATORS = TransliteratorPool()
@@ -0,0 +1,60 @@
+"""Unicode normalization of name data, with a fast path and a batch API.
+
+Name values are stored in the canonical composition form (NFC), and a
+warning (or error) is raised when that differs from the compatibility
+composition form (NFKC), since the difference may hide an undesirable
+character. The function normalize_unicode() skips both normalizations for
+ASCII strings and for strings that are already in NFKC (and so also in NFC),
+which covers nearly all real data, and memoizes the rest. normalize_batch()
+normalizes a whole column of values and lists the divergent ones.
+
+"""
+from collections import namedtuple
+from functools import lru_cache
+import unicodedata
+
+DEFAULT_CACHE_SIZE = 4096
+
+Divergence = namedtuple(
+    'Divergence', ['index', 'value', 'canonical', 'compatibility'])
+
+
+def normalize_unicode(v: str):
+    """Get the NFC and NFKC forms of a string.
+
+    Returns:
+        A tuple (canonical, compatibility); the two are equal unless the
+        compatibility normalization would change the string further.
+
+    """
+    if v.isascii() or unicodedata.is_normalized('NFKC', v):
+        return (v, v)
+    return _normalize_unicode(v)
+
+
+@lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _normalize_unicode(v: str):
+    return (
+        unicodedata.normalize('NFC', v), unicodedata.normalize('NFKC', v))
+
+
+def normalize_batch(values):
+    """Normalize a column of strings to NFC.
+
+    Args:
+        values: sequence of strings
+
+    Returns:
+        A tuple (normalized, divergences): the list of NFC forms of values,
+        in order, and a list of Divergence tuples (index, value, canonical,
+        compatibility) for the values whose NFC and NFKC forms differ.
+
+    """
+    normalized = []
+    divergences = []
+    for i, v in enumerate(values):
+        canonical, compatibility = normalize_unicode(v)
+        normalized.append(canonical)
+        if canonical != compatibility:
+            divergences.append(Divergence(i, v, canonical, compatibility))
+    return (normalized, divergences)
@@ -0,0 +1,100 @@
+"""Validate batches of Pleiades names, running HTTP checks concurrently.
+
+Constructing a PleiadesName checks its pid and slug against Pleiades over
+HTTP, one request after another. The function validate_names() instead
+collects every URL that a batch of names will need (see prefetch.py),
+fetches them all at once over a pool of keep-alive connections, registers the
+parent places it found, and only then constructs the PleiadesName objects,
+which find their responses already in hand.
+
+The function validate_deferred() does the same for PleiadesName objects
+constructed with defer_validation=True: it runs the cheap local checks on the
+whole batch first, then fetches what the survivors need, and only then runs
+their pid and slug lookups.
+
+"""
+from names import PleiadesName
+from prefetch import PrefetchPlan, DEFAULT_CONCURRENCY
+
+
+def validate_names(
+    rows, concurrency=DEFAULT_CONCURRENCY, plan=None, **kwargs
+):
+    """Construct and validate PleiadesName objects for many rows at once.
+
+    Args:
+        rows: sequence of dictionaries of keyword arguments for PleiadesName
+            (e.g., rows from a names CSV file, less the "nameid" column)
+        concurrency: maximum number of simultaneous HTTP requests
+        plan: a prefetch.PrefetchPlan covering rows; if omitted, one is made
+            from rows and kwargs. If it has not been executed yet, it is.
+        kwargs: further keyword arguments passed to every PleiadesName
+            (e.g., snapshot, http_fallback, skip_http_tests, places)
+
+    Returns:
+        A list with one (PleiadesName, None) or (None, exception) tuple per
+        row, in input order. The exception is the TypeError or ValueError
+        that constructing the PleiadesName raised.
+
+    """
+    if plan is None:
+        plan = PrefetchPlan(
+            snapshot=kwargs.get('snapshot'),
+            http_fallback=kwargs.get('http_fallback', True),
+            skip_http_tests=kwargs.get('skip_http_tests', False),
+            places=kwargs.get('places'))
+        plan.extend(rows)
+    if plan.responses is None:
+        plan.execute(concurrency=concurrency)
+    results = []
+    for row in rows:
+        try:
+            pn = PleiadesName(responses=plan.responses, **kwargs, **row)
+        except (TypeError, ValueError) as exc:
+            results.append((None, exc))
+        else:
+            results.append((pn, None))
+    return results
+
+
+def validate_deferred(
+    names, concurrency=DEFAULT_CONCURRENCY, **kwargs
+):
+    """Run the deferred checks of many PleiadesName objects at once.
+
+    Args:
+        names: sequence of PleiadesName objects constructed with
+            defer_validation=True
+        concurrency: maximum number of simultaneous HTTP requests
+        kwargs: snapshot, http_fallback, skip_http_tests, and places, as
+            given to the PleiadesName objects (used to plan the requests)
+
+    Returns:
+        A list with one (PleiadesName, None) or (PleiadesName, exception)
+        tuple per name, in input order. The exception is the ValueError that
+        PleiadesName.validate() raised.
+
+    """
+    errors = [None] * len(names)
+    for i, pn in enumerate(names):
+        try:
+            pn.validate(remote=False)
+        except ValueError as exc:
+            errors[i] = exc
+    plan = PrefetchPlan(
+        snapshot=kwargs.get('snapshot'),
+        http_fallback=kwargs.get('http_fallback', True),
+        skip_http_tests=kwargs.get('skip_http_tests', False),
+        places=kwargs.get('places'))
+    plan.extend([
+        {'pid': pn.pid, 'slug': pn.slug}
+        for pn, exc in zip(names, errors) if exc is None])
+    responses = plan.execute(concurrency=concurrency)
+    for i, pn in enumerate(names):
+        if errors[i] is not None:
+            continue
+        try:
+            pn.validate(local=False, responses=responses)
+        except ValueError as exc:
+            errors[i] = exc
+    return list(zip(names, errors))
@@ -8,8 +8,8 @@ import html2text
 import inspect
 import logging
 import os
+from pleiades_client import get_client
 import re
-import requests
 import sys
 import traceback
 
@@ -42,7 +42,7 @@ def main(args):
     main function
     """
     # logger = logging.getLogger(sys._getframe().f_code.co_name)
-    r = requests.get(args.source)
+    r = get_client().get(args.source)
     h = html2text.HTML2Text()
     h.ignore_images = True
     h.ignore_emphasis = True
@@ -0,0 +1,169 @@
+"""Lazily loaded, precompiled Pleiades vocabularies.
+
+Defines the class VocabularyStore, which loads each vocabulary only when it
+is first used, keeps its terms in a frozenset for fast membership tests, and
+raises VocabularyErrors (ValueErrors whose messages, which list every term
+of the vocabulary, are only built if they are actually displayed).
+Vocabularies are read from compact JSON lookup files ("<vocabulary
+name>.json", a dictionary of definitions keyed by term) in the store's
+directory (data/vocabularies, where the compiled vocabularies.py is
+committed), and only when there is no such file from the VOCABULARIES
+literal in vocabularies.py.
+
+Lookup files are written by compile_store(), from vocabularies.py or from
+the text that vocab_getter.py scrapes from the vocabulary pages of Pleiades
+(see parse_vocabulary_text() and build-vocabulary-store.py).
+
+VOCABULARY is the store shared by names.py and name_table.py.
+
+"""
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+
+DEFAULT_VOCABULARY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'vocabularies')
+# markdown links to vocabulary terms, as written by html2text
+RX_TERM_LINK = re.compile(
+    r'\[([^\]]*)\]\(\s*[^)\s]*/vocabularies/([^/)\s]+)/([^/)\s]+?)/?'
+    r'(?:\s+"[^"]*")?\s*\)')
+
+
+class VocabularyError(ValueError):
+    """A term not in a vocabulary; the message is built when displayed."""
+
+    def __init__(self, vocab_name: str, terms, term: str):
+        super().__init__(vocab_name, term)
+        self.vocab_name = vocab_name
+        self.terms = terms
+        self.term = term
+
+    def __str__(self):
+        return (
+            'PleiadesName attribute "{}" must be a string '
+            'containing a value from the list: "{}." '
+            'The provided value ("{}") does not meet this '
+            'requirement.'
+            ''.format(self.vocab_name, '", "'.join(self.terms), self.term))
+
+
+class VocabularyStore:
+    """Load vocabularies on first use and check terms against them."""
+
+    def __init__(self, path: str = DEFAULT_VOCABULARY_PATH):
+        """Create a store.
+
+        Args:
+            path: directory of compiled lookup files (need not exist)
+
+        """
+        self.path = path
+        self.loads = 0
+        self._definitions = {}
+        self._terms = {}
+        self._lock = threading.Lock()
+
+    def _load(self, vocab_name: str):
+        logger_name = ':'.join(
+            (__name__, inspect.currentframe().f_code.co_name))
+        logger = logging.getLogger(logger_name)
+        fn = os.path.join(self.path, '{}.json'.format(vocab_name))
+        if os.path.isfile(fn):
+            with open(fn, 'r', encoding='utf-8') as f:
+                definitions = json.load(f)
+            logger.debug('loaded vocabulary "{}" from {}'.format(
+                vocab_name, fn))
+        else:
+            from vocabularies import VOCABULARIES
+            definitions = VOCABULARIES[vocab_name]
+        with self._lock:
+            self._definitions[vocab_name] = definitions
+            self._terms[vocab_name] = frozenset(definitions.keys())
+            self.loads += 1
+
+    def terms(self, vocab_name: str):
+        """Get the frozenset of terms in a vocabulary.
+
+        Exceptions raised:
+            - KeyError: there is no such vocabulary.
+
+        """
+        try:
+            return self._terms[vocab_name]
+        except KeyError:
+            self._load(vocab_name)
+            return self._terms[vocab_name]
+
+    def definitions(self, vocab_name: str):
+        """Get the dictionary of definitions, keyed by term, of a vocabulary.
+        """
+        self.terms(vocab_name)
+        return self._definitions[vocab_name]
+
+    def check(self, vocab_name: str, term: str):
+        """Validate a vocabulary term.
+
+        Returns:
+            True if term is in the vocabulary.
+
+        Exceptions raised:
+            - VocabularyError (a ValueError): term is not in the vocabulary.
+
+        """
+        if term in self.terms(vocab_name):
+            return True
+        raise VocabularyError(
+            vocab_name, self.definitions(vocab_name).keys(), term)
+
+    def clear(self):
+        """Forget every loaded vocabulary."""
+        with self._lock:
+            self._definitions = {}
+            self._terms = {}
+
+
+def parse_vocabulary_text(text: str):
+    """Get vocabularies from the text vocab_getter.py saves.
+
+    Returns:
+        A dictionary keyed by vocabulary name of dictionaries of term titles
+        keyed by term, read from the links to terms (".../vocabularies/
+        <vocabulary name>/<term>") in text, in order.
+
+    """
+    vocabularies = {}
+    for title, vocab_name, term in RX_TERM_LINK.findall(text):
+        vocab_name = vocab_name.replace('-', '_')
+        vocabularies.setdefault(vocab_name, {}).setdefault(
+            term, ' '.join(title.split()))
+    return vocabularies
+
+
+def compile_store(path: str, vocabularies: dict = None):
+    """Write lookup files for vocabularies.
+
+    Args:
+        path: directory to which to write the files (created if necessary)
+        vocabularies: dictionary of dictionaries of definitions keyed by term,
+            keyed by vocabulary name (default: vocabularies.VOCABULARIES)
+
+    Returns:
+        The list of the names of the vocabularies written.
+
+    """
+    if vocabularies is None:
+        from vocabularies import VOCABULARIES
+        vocabularies = VOCABULARIES
+    os.makedirs(path, exist_ok=True)
+    for vocab_name, definitions in vocabularies.items():
+        fn = os.path.join(path, '{}.json'.format(vocab_name))
+        with open(fn, 'w', encoding='utf-8') as f:
+            json.dump(
+                definitions, f, ensure_ascii=False, separators=(',', ':'))
+    return list(vocabularies.keys())
+
+
+VOCABULARY = VocabularyStore()